@@ -0,0 +1,277 @@
+"""Offline benchmarks of plumes' load, audit and serialization paths
+
+Synthetic exports shaped like `examples/*.json` are generated once per size
+(under `benchmarks/data`) and every case reports its best wall time over a few
+repeats, its throughput and its peak traced memory. Results are compared
+against `benchmarks/baselines.json`, which holds numbers from a reference
+machine; refresh it with `--save` when running on different hardware.
+
+    python benchmarks/bench.py --sizes 10000,100000
+    python benchmarks/bench.py --sizes 1000000 --cases audit_users,audit_tweets
+    python benchmarks/bench.py --save
+"""
+
+import gc
+import json
+import logging
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, Optional
+
+import fire
+
+import plumes.audit as pau
+import plumes.cli as pc
+import plumes.formats as pf
+import plumes.utilities as pu
+
+BENCH_DIR = Path(__file__).parent
+DATA_DIR = BENCH_DIR / "data"
+BASELINES_PATH = BENCH_DIR / "baselines.json"
+RESOURCES_DIR = BENCH_DIR.parent / "tests" / "resources"
+SEED = 42
+
+
+def load_templates(name: str) -> list:
+    with open(RESOURCES_DIR / name) as f:
+        return json.load(f)
+
+
+def format_timestamp(ts: float) -> str:
+    """Twitter-style `created_at` (e.g., `Wed Oct 10 20:19:24 +0000 2018`)"""
+    return time.strftime("%a %b %d %H:%M:%S +0000 %Y", time.gmtime(ts))
+
+
+def make_users(n: int, seed: int = SEED) -> Iterator[dict]:
+    """Users copied from real ones with unique IDs and randomized counts"""
+    rng = random.Random(seed)
+    templates = load_templates("test-users.json")
+    now = time.time()
+    for i in range(n):
+        user = dict(templates[i % len(templates)])
+        user["id"] = 10**9 + i
+        user["id_str"] = str(user["id"])
+        user["screen_name"] = f"user{i}"
+        user["followers_count"] = int(rng.paretovariate(1.2) * 50)
+        user["friends_count"] = int(rng.paretovariate(1.5) * 100)
+        user["statuses_count"] = rng.randrange(50_000)
+        user["favourites_count"] = rng.randrange(50_000)
+        if rng.random() < 0.95:
+            created_at = format_timestamp(now - rng.uniform(0, 3 * 365 * 86400))
+            user["status"] = {**user.get("status", {}), "created_at": created_at}
+        else:
+            user.pop("status", None)
+        yield user
+
+
+def make_tweets(n: int, seed: int = SEED) -> Iterator[dict]:
+    """Tweets copied from real ones with unique IDs, dates and counts"""
+    rng = random.Random(seed)
+    templates = load_templates("test-tweets.json")
+    now = time.time()
+    for i in range(n):
+        tweet = dict(templates[i % len(templates)])
+        tweet["id"] = 10**18 + i
+        tweet["id_str"] = str(tweet["id"])
+        tweet["created_at"] = format_timestamp(now - rng.uniform(0, 5 * 365 * 86400))
+        tweet["favorite_count"] = int(rng.paretovariate(1.1) * 5)
+        tweet["retweet_count"] = int(rng.paretovariate(1.3) * 2)
+        tweet["favorited"] = rng.random() < 0.3
+        yield tweet
+
+
+def get_export(kind: str, n: int) -> Path:
+    """Path to a synthetic JSON array export, generating it if needed"""
+    path = DATA_DIR / f"synthetic-{kind}-{n}.json"
+    if path.exists():
+        return path
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    records = make_users(n) if kind == "users" else make_tweets(n)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write("[\n")
+        for i, r in enumerate(records):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(r))
+        f.write("\n]\n")
+    tmp_path.rename(path)
+    return path
+
+
+def convert(path: Path, format: str) -> Path:
+    """Copy of a synthetic export in another format, generating it if needed"""
+    converted = path.with_name(f"{path.stem}{pf.get_extension(format)}")
+    if not converted.exists():
+        pu.dump_records(
+            records=pu.load_records(path), path=converted, compact=format == "compact"
+        )
+    return converted
+
+
+def load_models(path: Path) -> list:
+    # tweepy models only need `_json` to be serialized
+    return [SimpleNamespace(_json=r) for r in pu.iter_records(path)]
+
+
+def serialize_jsonl(models: list, path: Path):
+    with open(path, "w") as f:
+        pu.tweepy_to_jsonl(models=models, f=f)
+
+
+def set_outputs(n: int, path: Path):
+    for i in range(n):
+        pu.set_output(fname=f"user{i}-friends.json", path=str(path))
+
+
+# case: (export kind, setup returning the case's input, benchmarked function)
+CASES = {
+    "load_users": ("users", None, lambda path, _: pau.load_users(path)),
+    "load_tweets": ("tweets", None, lambda path, _: pau.load_tweets(path)),
+    "load_tweets_jsonl_gz": (
+        "tweets",
+        lambda path: convert(path, "jsonl.gz"),
+        lambda path, converted: pau.load_tweets(converted),
+    ),
+    "load_users_csv": (
+        "users",
+        lambda path: convert(path, "csv"),
+        lambda path, converted: pau.load_users(converted),
+    ),
+    "audit_users": (
+        "users",
+        None,
+        lambda path, _: pc.audit_users(
+            str(path), max_followers=100, days=365, where="tff_ratio < 0.5"
+        ),
+    ),
+    "audit_tweets": (
+        "tweets",
+        None,
+        lambda path, _: pc.audit_tweets(
+            str(path), days=365, self_favorited=False, where="favorite_count < 5"
+        ),
+    ),
+    "tweepy_to_json": (
+        "tweets",
+        load_models,
+        lambda path, models: pu.tweepy_to_json(
+            models=models, path=DATA_DIR / "output.json"
+        ),
+    ),
+    "tweepy_to_jsonl": (
+        "tweets",
+        load_models,
+        lambda path, models: serialize_jsonl(
+            models=models, path=DATA_DIR / "output.jsonl"
+        ),
+    ),
+    "set_output": ("users", None, lambda path, _: set_outputs(1000, DATA_DIR)),
+}
+
+
+def measure(func: Callable, repeats: int) -> Dict[str, float]:
+    """Best wall time over `repeats` runs, then peak memory of a traced run"""
+    seconds = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+
+    # tracing slows everything down, so memory gets its own run
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds": min(seconds), "peak_mb": peak / 2**20}
+
+
+def compare(result: dict, baseline: Optional[dict], tolerance: float) -> str:
+    if baseline is None:
+        return "no baseline"
+
+    ratio = result["seconds"] / baseline["seconds"]
+    status = "REGRESSION" if ratio > 1 + tolerance else "ok"
+    return f"{ratio:.2f}x baseline time ({status})"
+
+
+def main(
+    sizes: str = "10000,100000",
+    cases: Optional[str] = None,
+    repeats: int = 3,
+    tolerance: float = 0.25,
+    save: bool = False,
+):
+    """Run the benchmarks and compare them against the stored baselines
+
+    Args:
+        sizes (str, optional): Comma-separated numbers of records per export (e.g., 10000,100000,1000000). Defaults to "10000,100000".
+        cases (Optional[str], optional): Comma-separated cases to run. Defaults to all cases.
+        repeats (int, optional): Timed runs per case; the best is kept. Defaults to 3.
+        tolerance (float, optional): Slowdown over the baseline reported as a regression. Defaults to 0.25.
+        save (bool, optional): Store the results as the new baselines. Defaults to False.
+    """
+    # fire parses comma-separated values into tuples and single values into ints
+    if isinstance(sizes, int):
+        sizes = [sizes]
+    elif isinstance(sizes, str):
+        sizes = sizes.split(",")
+    sizes = [int(s) for s in sizes]
+    if cases is None:
+        cases = list(CASES)
+    elif isinstance(cases, str):
+        cases = cases.split(",")
+
+    # audits log every identified record
+    logging.getLogger("plumes").setLevel(logging.WARNING)
+
+    baselines = {}
+    if BASELINES_PATH.exists():
+        with open(BASELINES_PATH) as f:
+            baselines = json.load(f)
+
+    results = {}
+    regressions = 0
+    for n in sizes:
+        for case in cases:
+            kind, setup, func = CASES[case]
+            path = get_export(kind, n)
+            data = setup(path) if setup else None
+
+            # set_output makes a fixed number of calls, whatever the size
+            count = 1000 if case == "set_output" else n
+
+            key = f"{case}@{n}"
+            results[key] = measure(lambda: func(path, data), repeats=repeats)
+            results[key]["records_per_second"] = count / results[key]["seconds"]
+
+            summary = compare(results[key], baselines.get(key), tolerance)
+            regressions += "REGRESSION" in summary
+            print(
+                f"{key:>28}: {results[key]['seconds']:8.3f}s "
+                f"{results[key]['records_per_second']:12,.0f}/s "
+                f"{results[key]['peak_mb']:9.1f} MB peak  {summary}"
+            )
+            # free the input before the next case
+            data = None
+
+    if save:
+        baselines.update(results)
+        with open(BASELINES_PATH, "w") as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+        print(f"Saved baselines to {BASELINES_PATH}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
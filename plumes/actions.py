@@ -0,0 +1,291 @@
+import concurrent.futures
+import functools
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import tweepy
+from tqdm import tqdm
+
+import plumes.metrics as pm
+import plumes.ratelimit as pr
+import plumes.utilities as pu
+from plumes.config import settings
+
+LOGGER = logging.getLogger("plumes")
+
+# action: (API method, rate limited endpoint, progress description, target's
+# parameter); users are targeted by ID since screen names can change
+ACTIONS = {
+    "unfollow": (
+        "destroy_friendship",
+        "/friendships/destroy",
+        "Unfollowing",
+        "user_id",
+    ),
+    "follow": ("create_friendship", "/friendships/create", "Following", "user_id"),
+    "delete": ("destroy_status", "/statuses/destroy/:id", "Deleting", "id"),
+    "favorite": ("create_favorite", "/favorites/create", "Favoriting", "id"),
+    "unfavorite": ("destroy_favorite", "/favorites/destroy", "Unfavoriting", "id"),
+}
+
+# actions that undo each other (e.g., a follow after an unfollow must run)
+INVERSES = {
+    "follow": "unfollow",
+    "unfollow": "follow",
+    "favorite": "unfavorite",
+    "unfavorite": "favorite",
+}
+
+# API error codes of actions that were already done (e.g., deleting a deleted
+# tweet or favoriting a favorited one)
+DONE_CODES = {34, 139, 144}
+DONE_OUTCOMES = {"succeeded", "already_done"}
+
+
+class Journal:
+    """Append-only log of every action's outcome, one JSON object per line
+
+    Runs skip the targets an action already succeeded on, so an interrupted
+    run can be repeated without spending rate limit on them again. Entries
+    are recorded under the authenticated account, so accounts sharing a
+    journal never skip each other's targets.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def get_done(self, action: str, account: Optional[str] = None) -> Set[str]:
+        """Targets the action is done on for the account
+
+        A target is done if the latest action that succeeded on it (or found
+        it already done), among this action and its inverse, is this action.
+        """
+        if not self.path.exists():
+            return set()
+
+        actions = {action, INVERSES.get(action)}
+        latest = {}
+        with self.lock, open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # e.g., the last line of a crashed run
+                    continue
+                if (
+                    entry["action"] in actions
+                    and entry["outcome"] in DONE_OUTCOMES
+                    and entry.get("account") == account
+                ):
+                    latest[entry["target"]] = entry["action"]
+        return {target for target, a in latest.items() if a == action}
+
+    def record(
+        self,
+        action: str,
+        target: str,
+        outcome: str,
+        error: Optional[str] = None,
+        account: Optional[str] = None,
+    ):
+        entry = {
+            "account": account,
+            "action": action,
+            "target": str(target),
+            "outcome": outcome,
+            "error": error,
+            "timestamp": time.time(),
+        }
+        with self.lock, open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+@functools.lru_cache(maxsize=None)
+def get_journal() -> Optional[Journal]:
+    """Process-wide action journal, unless disabled"""
+    if not settings.journal_path:
+        return None
+    return Journal(Path(settings.journal_path).expanduser())
+
+
+def is_already_done(error: tweepy.error.TweepError) -> bool:
+    return getattr(error, "api_code", None) in DONE_CODES
+
+
+def is_transient(error: tweepy.error.TweepError) -> bool:
+    """Whether a failed action is worth retrying (e.g., network, 429, 5xx)"""
+    response = error.response
+    return (
+        response is None or response.status_code == 429 or response.status_code >= 500
+    )
+
+
+def run_action(func, target: str, description: str, retries: int):
+    LOGGER.info(f"{description} {target}")
+
+    for attempt in range(retries + 1):
+        try:
+            return func(target)
+        except tweepy.error.TweepError as e:
+            if attempt == retries or is_already_done(e) or not is_transient(e):
+                raise
+
+            if e.response is not None and e.response.status_code == 429:
+                delay = pr.get_reset_delay(e.response)
+            else:
+                delay = settings.action_backoff * 2**attempt
+            LOGGER.warning(
+                f"{description} {target} failed ({e}); retrying in {delay:.0f}s"
+            )
+            pm.get_metrics().record_sleep("action_retry", delay)
+            time.sleep(delay)
+
+
+def run_actions(
+    func,
+    targets: Iterable[str],
+    api: tweepy.API,
+    endpoint: str,
+    description: str,
+    workers: Optional[int] = None,
+    retries: Optional[int] = None,
+    action: Optional[str] = None,
+    journal: Optional[Journal] = None,
+    account: Optional[str] = None,
+) -> dict:
+    """Apply a mutating API method (e.g., `api.destroy_status`) to many targets
+
+    Actions run on a bounded worker pool sharing one client and the endpoint's
+    rate limit budget. Transient failures are retried with exponential backoff.
+    With a journal, every outcome is recorded under `action` and `account`
+    (i.e., the authenticated user's ID), and targets it's done on are skipped.
+
+    Returns:
+        dict: Succeeded and skipped targets, and failed targets mapped to their
+        error.
+    """
+    workers = settings.action_workers if workers is None else workers
+    retries = settings.action_retries if retries is None else retries
+    func = pr.get_rate_limiter().wrap(func, api=api, endpoint=endpoint)
+    action = action or endpoint
+
+    summary = {"succeeded": [], "skipped": [], "failed": {}}
+    targets = list(targets)
+    if journal is not None:
+        done = journal.get_done(action, account=account)
+        summary["skipped"] = [t for t in targets if str(t) in done]
+        targets = [t for t in targets if str(t) not in done]
+        if summary["skipped"]:
+            LOGGER.info(f"Skipping {len(summary['skipped'])} targets already done")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_action, func, t, description, retries): t
+            for t in targets
+        }
+        for future in tqdm(
+            concurrent.futures.as_completed(futures), total=len(futures)
+        ):
+            target = futures[future]
+            error = None
+            try:
+                future.result()
+                outcome = "succeeded"
+                summary["succeeded"].append(target)
+            except tweepy.error.TweepError as e:
+                error = str(e)
+                if is_already_done(e):
+                    LOGGER.info(f"{description} {target}: already done")
+                    outcome = "already_done"
+                    summary["succeeded"].append(target)
+                else:
+                    LOGGER.error(f"{description} {target} failed: {e}")
+                    outcome = "failed"
+                    summary["failed"][target] = e
+
+            if journal is not None:
+                journal.record(action, target, outcome, error=error, account=account)
+
+    LOGGER.info(
+        f"{description}: {len(summary['succeeded'])} succeeded, "
+        f"{len(summary['skipped'])} skipped, {len(summary['failed'])} failed"
+    )
+    return summary
+
+
+def execute_plan(
+    plan: Dict[str, List[str]],
+    api: tweepy.API,
+    journal: Optional[Journal] = None,
+    workers: Optional[int] = None,
+) -> Dict[str, dict]:
+    """Run named actions (e.g., `{"delete": [...]}`), journaling every outcome
+
+    Returns:
+        Dict[str, dict]: Each action's summary (see `run_actions`).
+    """
+    for action in plan:
+        if action not in ACTIONS:
+            raise ValueError(
+                f"Unknown action {action!r}; expected one of {', '.join(ACTIONS)}"
+            )
+
+    journal = get_journal() if journal is None else journal
+    account = pu.get_user(api=api).id_str if journal is not None else None
+    summaries = {}
+    for action, targets in plan.items():
+        method, endpoint, description, param = ACTIONS[action]
+        summaries[action] = run_actions(
+            func=functools.partial(call_with_target, getattr(api, method), param),
+            targets=targets,
+            api=api,
+            endpoint=endpoint,
+            description=description,
+            workers=workers,
+            action=action,
+            journal=journal,
+            account=account,
+        )
+    return summaries
+
+
+def call_with_target(method, param: str, target: str):
+    # e.g., `api.destroy_friendship(user_id=target)`
+    return method(**{param: target})
+
+
+def write_plan(
+    plan: Dict[str, List[str]], path: Path, labels: Optional[Dict[str, str]] = None
+):
+    """Write planned actions as JSON Lines (i.e., one action and target per line)
+
+    Args:
+        plan (Dict[str, List[str]]): Targets of each action.
+        path (Path): Output path.
+        labels (Optional[Dict[str, str]], optional): Readable names of targets (e.g., screen names of user IDs) written alongside them for review. Defaults to None.
+    """
+    labels = labels or {}
+    with open(path, "w") as f:
+        for action, targets in plan.items():
+            for t in targets:
+                entry = {"action": action, "target": str(t)}
+                if str(t) in labels:
+                    entry["label"] = labels[str(t)]
+                f.write(json.dumps(entry) + "\n")
+
+    count = sum(len(t) for t in plan.values())
+    LOGGER.info(f"Planned {count} actions; run them with `plumes run_plan {path}`")
+
+
+def load_plan(path: Path) -> Dict[str, List[str]]:
+    plan = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                plan.setdefault(entry["action"], []).append(entry["target"])
+    return plan
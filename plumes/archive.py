@@ -0,0 +1,123 @@
+import io
+import re
+import time
+import zipfile
+from pathlib import Path
+from typing import Iterator, List, TextIO
+
+import plumes.utilities as pu
+
+# archive kind: names of its data files (e.g., `data/tweets-part1.js`)
+ARCHIVE_FILES = {"tweets": ["tweet", "tweets"], "favorites": ["like"]}
+
+# data files found in every archive (e.g., `data/manifest.js` or `data/tweet.js`)
+ARCHIVE_MARKER = re.compile(r"(^|/)(manifest|tweets?|like)(-part\d+)?\.js$")
+
+# tweet IDs above this embed their creation time (i.e., Snowflake IDs)
+SNOWFLAKE_MIN_ID = 29700859247
+TWITTER_EPOCH_MS = 1288834974657
+
+# older tweets can't be dated from their ID, but predate Snowflake IDs; date
+# them to its start (Nov 4, 2010) so age criteria still match them
+PRE_SNOWFLAKE_CREATED_AT = time.strftime(
+    "%a %b %d %H:%M:%S +0000 %Y", time.gmtime(TWITTER_EPOCH_MS / 1000)
+)
+
+
+def is_archive(path: Path) -> bool:
+    """Whether a path is a whole Twitter archive (i.e., its zip or extracted folder)
+
+    Only folders and zips holding the archive's manifest or tweet or like data
+    files (e.g., `data/tweet.js`) are archives, not just any folder or zip.
+    """
+    path = Path(path)
+    if path.is_dir():
+        names = [str(p.relative_to(path)) for p in path.rglob("*.js")]
+    elif path.suffix == ".zip" and zipfile.is_zipfile(str(path)):
+        with zipfile.ZipFile(path) as archive:
+            names = archive.namelist()
+    else:
+        return False
+    return any(ARCHIVE_MARKER.search(n) for n in names)
+
+
+def get_created_at(tweet_id: str):
+    """Twitter-style `created_at` of a tweet from its ID, if it embeds one"""
+    if int(tweet_id) <= SNOWFLAKE_MIN_ID:
+        return None
+    seconds = ((int(tweet_id) >> 22) + TWITTER_EPOCH_MS) / 1000
+    return time.strftime("%a %b %d %H:%M:%S +0000 %Y", time.gmtime(seconds))
+
+
+def normalize_tweet(record: dict) -> dict:
+    """Archived tweet with the fields and types of an API tweet"""
+    tweet = dict(record.get("tweet", record))
+    for k in ["id", "favorite_count", "retweet_count"]:
+        if k in tweet:
+            tweet[k] = int(tweet[k])
+    tweet.setdefault("text", tweet.get("full_text", ""))
+    tweet.setdefault("favorited", False)
+    return tweet
+
+
+def normalize_like(record: dict) -> dict:
+    """Archived like as a tweet; archives don't keep likes' counts or dates
+
+    `created_at` is the liked tweet's creation time (i.e., not when it was
+    liked), dated from its ID.
+    """
+    like = record.get("like", record)
+    tweet_id = like["tweetId"]
+    return {
+        "id": int(tweet_id),
+        "id_str": tweet_id,
+        "text": like.get("fullText", ""),
+        "created_at": get_created_at(tweet_id) or PRE_SNOWFLAKE_CREATED_AT,
+        "favorite_count": 0,
+        "retweet_count": 0,
+        "favorited": True,
+    }
+
+
+def iter_archive_file(f: TextIO, chunk_size: int = 2**16) -> Iterator[dict]:
+    """Stream the normalized records of an archive data file (e.g., `tweet.js`)"""
+    # skip the JavaScript assignment (e.g., `window.YTD.tweet.part0 = `)
+    while f.read(1) not in ["=", ""]:
+        pass
+
+    for record in pu.iter_json(f, chunk_size=chunk_size):
+        if "like" in record or "tweetId" in record:
+            yield normalize_like(record)
+        else:
+            yield normalize_tweet(record)
+
+
+def get_part(name: str) -> int:
+    match = re.search(r"-part(\d+)\.js$", name)
+    return int(match.group(1)) if match else 0
+
+
+def get_data_files(names: List[str], kind: str) -> List[str]:
+    """An archive's data files of a kind (tweets or favorites), in part order"""
+    if kind not in ARCHIVE_FILES:
+        raise ValueError(
+            f"Unknown archive kind {kind!r}; expected one of {', '.join(ARCHIVE_FILES)}"
+        )
+    pattern = re.compile(rf"(^|/)({'|'.join(ARCHIVE_FILES[kind])})(-part\d+)?\.js$")
+    return sorted((n for n in names if pattern.search(n)), key=get_part)
+
+
+def iter_archive(path: Path, kind: str = "tweets") -> Iterator[dict]:
+    """Stream the tweets or likes (as tweets) of a Twitter archive, without extracting it"""
+    path = Path(path)
+    if path.is_dir():
+        names = [str(p.relative_to(path)) for p in path.rglob("*.js")]
+        for name in get_data_files(names, kind=kind):
+            with open(path / name, encoding="utf-8") as f:
+                yield from iter_archive_file(f)
+        return
+
+    with zipfile.ZipFile(path) as archive:
+        for name in get_data_files(archive.namelist(), kind=kind):
+            with archive.open(name) as raw:
+                yield from iter_archive_file(io.TextIOWrapper(raw, encoding="utf-8"))
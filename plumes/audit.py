@@ -0,0 +1,377 @@
+import ast
+import datetime
+import email.utils as eu
+import operator
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+import plumes.archive as parch
+import plumes.index as pi
+import plumes.utilities as pu
+
+USER_COUNTS = ["followers_count", "friends_count", "statuses_count", "favourites_count"]
+TWEET_COUNTS = ["favorite_count", "retweet_count"]
+
+
+def parse_timestamps(values: List[Optional[str]]) -> np.ndarray:
+    """Parse Twitter `created_at` strings into epoch seconds (NaN if missing)"""
+    # parse each distinct timestamp once
+    cache = {None: np.nan}
+    for v in values:
+        if v not in cache:
+            cache[v] = eu.parsedate_to_datetime(v).timestamp()
+
+    return np.fromiter((cache[v] for v in values), dtype=float, count=len(values))
+
+
+def calculate_ratio(numerators: np.ndarray, denominators: np.ndarray) -> np.ndarray:
+    """Vectorized ratio matching `calculate_tff_ratio` and `calculate_like_retweet_ratio`"""
+    numerators = numerators.astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = numerators / denominators
+    ratio[denominators == 0] = np.inf
+    ratio[numerators == 0] = 0
+    return ratio
+
+
+def get_date_limit(days: int) -> float:
+    """Epoch seconds of the start of the (UTC) day `days` days ago"""
+    limit = datetime.date.today() - datetime.timedelta(days=days)
+    return datetime.datetime(
+        limit.year, limit.month, limit.day, tzinfo=datetime.timezone.utc
+    ).timestamp()
+
+
+class Record:
+    """Compact, slotted projection of an exported record"""
+
+    __slots__ = []
+
+    def __init__(self, *values):
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and all(
+            getattr(self, f) == getattr(other, f) for f in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{f}={getattr(self, f)!r}" for f in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+class UserRecord(Record):
+    __slots__ = ["id_str", "screen_name", *USER_COUNTS, "status_created_at"]
+
+    @classmethod
+    def from_json(cls, user: dict) -> "UserRecord":
+        return cls(
+            user["id_str"],
+            user["screen_name"],
+            *(user[k] for k in USER_COUNTS),
+            user.get("status", {}).get("created_at"),
+        )
+
+
+class TweetRecord(Record):
+    __slots__ = ["id_str", "text", "created_at", *TWEET_COUNTS, "favorited"]
+
+    @classmethod
+    def from_json(cls, tweet: dict) -> "TweetRecord":
+        return cls(
+            tweet["id_str"],
+            tweet["text"],
+            tweet["created_at"],
+            *(tweet[k] for k in TWEET_COUNTS),
+            tweet["favorited"],
+        )
+
+
+def iter_export(
+    path: Path, targets: Optional[List[str]] = None, kind: Optional[str] = None
+) -> Iterable[dict]:
+    if parch.is_archive(path):
+        if targets is not None:
+            raise ValueError("Targets can only be read from JSON Lines exports")
+        return parch.iter_archive(path, kind=kind or "tweets")
+    if Path(path).is_dir() or Path(path).suffix == ".zip":
+        raise ValueError(
+            f"{path} is not a Twitter archive (i.e., it has no data/manifest.js, "
+            "data/tweet.js or data/like.js) nor an export"
+        )
+
+    if targets is None:
+        return pu.iter_records(path)
+
+    # only read the targeted records, however large the export
+    with pi.IndexedExport(path) as export:
+        return export.find_many(targets)
+
+
+def load_users(path: Path, targets: Optional[List[str]] = None) -> List[UserRecord]:
+    """Stream an export of users, keeping only the audited fields
+
+    Given `targets` (i.e., screen names or IDs), only those users are read
+    through the export's offset index.
+    """
+    if parch.is_archive(path):
+        raise ValueError("Twitter archives hold tweets and likes, not users")
+    return [UserRecord.from_json(u) for u in iter_export(path, targets)]
+
+
+def load_tweets(
+    path: Path, targets: Optional[List[str]] = None, kind: Optional[str] = None
+) -> List[TweetRecord]:
+    """Stream an export of tweets, keeping only the audited fields
+
+    Given `targets` (i.e., IDs), only those tweets are read through the
+    export's offset index. Whole Twitter archives are read from their `kind`
+    (i.e., tweets or favorites) data files.
+    """
+    return [TweetRecord.from_json(t) for t in iter_export(path, targets, kind)]
+
+
+class Columns:
+    """NumPy columns over a list of records, each built only when first used"""
+
+    def __init__(
+        self,
+        records: List[Record],
+        builders: Dict[str, Callable],
+        context: Optional[dict] = None,
+    ):
+        self.records = records
+        self.builders = builders
+        self.context = context or {}
+        self.cache = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, field: str) -> bool:
+        return field in self.builders
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        if field not in self.cache:
+            self.cache[field] = self.builders[field](self)
+        return self.cache[field]
+
+
+def count_column(field: str) -> Callable:
+    def build(cols: Columns) -> np.ndarray:
+        return np.fromiter(
+            (getattr(r, field) for r in cols.records), dtype=np.int64, count=len(cols)
+        )
+
+    return build
+
+
+def get_last_status(cols: "Columns") -> np.ndarray:
+    timestamps = parse_timestamps([u.status_created_at for u in cols.records])
+    # users who never tweeted are infinitely old
+    timestamps[np.isnan(timestamps)] = -np.inf
+    return timestamps
+
+
+def days_since(timestamps: np.ndarray) -> np.ndarray:
+    return (time.time() - timestamps) / 86400
+
+
+def relationship_column(kind: str) -> Callable:
+    def build(cols: Columns) -> np.ndarray:
+        ids = cols.context.get(kind)
+        if ids is None:
+            raise ValueError(f"Relationship fields need the {kind} export (--{kind})")
+        return np.fromiter(
+            (u.id_str in ids for u in cols.records), dtype=bool, count=len(cols)
+        )
+
+    return build
+
+
+def load_ids(path: Path) -> Set[str]:
+    """Stream the `id_str` of every record in an export into a hash set"""
+    return {r["id_str"] for r in pu.iter_records(path)}
+
+
+USER_FIELDS = {
+    **{k: count_column(k) for k in USER_COUNTS},
+    "id_str": lambda c: np.array([u.id_str for u in c.records], dtype=object),
+    "screen_name": lambda c: np.array([u.screen_name for u in c.records], dtype=object),
+    "last_status": get_last_status,
+    "days_since_status": lambda c: days_since(c["last_status"]),
+    "tff_ratio": lambda c: calculate_ratio(c["followers_count"], c["friends_count"]),
+    "following": relationship_column("friends"),
+    "follows_back": relationship_column("followers"),
+    "mutual": lambda c: c["following"] & c["follows_back"],
+    "fan": lambda c: c["follows_back"] & ~c["following"],
+}
+
+TWEET_FIELDS = {
+    **{k: count_column(k) for k in TWEET_COUNTS},
+    "id_str": lambda c: np.array([t.id_str for t in c.records], dtype=object),
+    "favorited": lambda c: np.fromiter(
+        (t.favorited for t in c.records), dtype=bool, count=len(c)
+    ),
+    "created_at": lambda c: parse_timestamps([t.created_at for t in c.records]),
+    "days_since_created": lambda c: days_since(c["created_at"]),
+    "like_retweet_ratio": lambda c: calculate_ratio(
+        c["favorite_count"], c["retweet_count"]
+    ),
+}
+
+
+def get_user_columns(
+    users: List[UserRecord],
+    friends: Optional[Set[str]] = None,
+    followers: Optional[Set[str]] = None,
+) -> Columns:
+    """Columns over users, with relationship flags if friends/followers are given"""
+    return Columns(
+        users, USER_FIELDS, context={"friends": friends, "followers": followers}
+    )
+
+
+def get_tweet_columns(tweets: List[TweetRecord]) -> Columns:
+    return Columns(tweets, TWEET_FIELDS)
+
+
+OPERATORS = {"<": operator.lt, ">": operator.gt, "==": operator.eq}
+
+
+def evaluate_criteria(
+    cols: Columns, criteria: List[Tuple[str, str, object]]
+) -> List[np.ndarray]:
+    """Evaluate `(field, operator, value)` criteria into one mask each"""
+    return [OPERATORS[op](cols[field], value) for field, op, value in criteria]
+
+
+def combine_clauses(clauses: List[np.ndarray], size: int, bool_or: bool) -> np.ndarray:
+    """Combine per-criterion masks; with no criteria, nothing is identified"""
+    if not clauses:
+        return np.zeros(size, dtype=bool)
+
+    if bool_or:
+        return np.logical_or.reduce(clauses)
+    return np.logical_and.reduce(clauses)
+
+
+COMPARISONS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+
+def compile_where(expression: str, fields: Dict[str, Callable]) -> Callable:
+    """Compile a filter expression into a function mapping `Columns` to a mask
+
+    Expressions combine comparisons of fields and constants with `and`, `or` and
+    `not` (e.g., `followers_count < 50 and days_since_status > 365`). Only the
+    fields referenced are ever built.
+
+    Raises:
+        ValueError: Invalid syntax, unsupported construct or unknown field.
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression {expression!r}: {e.msg}")
+
+    predicate = compile_node(tree.body, fields)
+
+    def evaluate(cols: Columns) -> np.ndarray:
+        mask = np.asarray(predicate(cols), dtype=bool)
+        # expressions of constants (e.g., `True`) give one value for every row
+        if mask.ndim == 0:
+            return np.full(len(cols), bool(mask))
+        return mask
+
+    return evaluate
+
+
+def compile_node(node: ast.AST, fields: Dict[str, Callable]) -> Callable:  # noqa C901
+    if isinstance(node, ast.BoolOp):
+        return compile_bool_op(node, fields)
+
+    if isinstance(node, ast.Compare):
+        left = compile_node(node.left, fields)
+        pairs = [
+            (COMPARISONS[type(op)], compile_node(right, fields))
+            for op, right in zip(node.ops, node.comparators)
+            if type(op) in COMPARISONS
+        ]
+        if len(pairs) != len(node.ops):
+            raise ValueError("Unsupported comparison operator")
+
+        def compare(cols: Columns) -> np.ndarray:
+            # chained comparisons (e.g., `10 < friends_count < 100`)
+            lhs = left(cols)
+            mask = np.ones(len(cols), dtype=bool)
+            for op, right in pairs:
+                rhs = right(cols)
+                mask &= op(lhs, rhs)
+                lhs = rhs
+            return mask
+
+        return compare
+
+    if isinstance(node, ast.UnaryOp):
+        operand = compile_node(node.operand, fields)
+        if isinstance(node.op, ast.Not):
+            return lambda cols: ~np.asarray(operand(cols), dtype=bool)
+        if isinstance(node.op, ast.USub):
+            return lambda cols: -operand(cols)
+        raise ValueError("Unsupported unary operator")
+
+    if isinstance(node, ast.Name) and node.id in fields:
+        return lambda cols: cols[node.id]
+
+    if isinstance(node, ast.Name):
+        raise ValueError(
+            f"Unknown field {node.id!r}; expected one of {', '.join(sorted(fields))}"
+        )
+
+    value = get_constant(node)
+    return lambda cols: value
+
+
+def compile_bool_op(node: ast.BoolOp, fields: Dict[str, Callable]) -> Callable:
+    operands = [compile_node(v, fields) for v in node.values]
+    is_and = isinstance(node.op, ast.And)
+
+    def evaluate(cols: Columns) -> np.ndarray:
+        mask = np.asarray(operands[0](cols), dtype=bool)
+        for operand in operands[1:]:
+            # short-circuit once every row is decided
+            if (is_and and not mask.any()) or (not is_and and mask.all()):
+                break
+            if is_and:
+                mask = mask & operand(cols)
+            else:
+                mask = mask | operand(cols)
+        return mask
+
+    return evaluate
+
+
+def get_constant(node: ast.AST):
+    if sys.version_info >= (3, 8):  # pragma: no cover
+        if isinstance(node, ast.Constant):
+            return node.value
+    elif isinstance(node, ast.Num):  # pragma: no cover
+        return node.n
+    elif isinstance(node, ast.Str):  # pragma: no cover
+        return node.s
+    elif isinstance(node, ast.NameConstant):  # pragma: no cover
+        return node.value
+
+    raise ValueError(f"Unsupported expression: {type(node).__name__}")
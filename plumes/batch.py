@@ -0,0 +1,126 @@
+import concurrent.futures
+import logging
+from pathlib import Path
+from typing import Iterable, Optional
+
+import tweepy
+from tqdm import tqdm
+
+import plumes.formats as pf
+import plumes.index as pi
+import plumes.ratelimit as pr
+import plumes.utilities as pu
+from plumes.config import settings
+
+LOGGER = logging.getLogger("plumes")
+
+# export kind: (API method, rate limited endpoint, user count used as limit)
+EXPORTS = {
+    "friends": ("friends", "/friends/list", "friends_count"),
+    "followers": ("followers", "/followers/list", "followers_count"),
+    "tweets": ("user_timeline", "/statuses/user_timeline", "statuses_count"),
+    "favorites": ("favorites", "/favorites/list", "favourites_count"),
+}
+
+
+def export_account(
+    api: tweepy.API,
+    screen_name: str,
+    kind: str,
+    output: Optional[str] = None,
+    limit: Optional[int] = None,
+    incremental: bool = False,
+    format: str = "jsonl",
+    index: bool = False,
+) -> Path:
+    """Export one account to `<screen_name>-<kind>.<format>`"""
+    method, endpoint, count_field = EXPORTS[kind]
+    base, _ = pf.parse_format(format)
+    # the user's counts limit the export, so never size it from the cache
+    user = pu.get_user(screen_name=screen_name, api=api, refresh=True)
+
+    fname = f"{user.screen_name}-{kind}{pf.get_extension(format)}"
+    path = pu.set_output(fname=fname, path=output)
+    if index:
+        pi.check_indexable(path)
+    pu.get_tweepy_objects(
+        func=getattr(api, method),
+        screen_name=user.screen_name,
+        output=path,
+        total=limit or getattr(user, count_field),
+        jsonl=base == "jsonl",
+        compact=base == "compact",
+        incremental=incremental,
+        api=api,
+        endpoint=endpoint,
+        progress=False,
+    )
+    if index:
+        pi.build_index(path)
+    return path
+
+
+def export_accounts(
+    api: tweepy.API,
+    screen_names: Iterable[str],
+    kind: str,
+    output: Optional[str] = None,
+    limit: Optional[int] = None,
+    incremental: bool = False,
+    workers: Optional[int] = None,
+    format: str = "jsonl",
+    index: bool = False,
+) -> dict:
+    """Export many accounts concurrently
+
+    Accounts are paged on a bounded worker pool sharing one client and the
+    process-wide rate limiter, so waiting on the network overlaps across
+    accounts and only the API quotas bound the total time.
+
+    Returns:
+        dict: Succeeded screen names mapped to their export path and failed
+        screen names mapped to their error.
+    """
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown kind {kind!r}; expected one of {', '.join(EXPORTS)}")
+    # fail fast rather than once per account
+    extension = pf.get_extension(format)
+    if index:
+        pi.check_indexable(Path(f"{kind}{extension}"))
+
+    workers = settings.batch_workers if workers is None else workers
+    pr.get_rate_limiter().prime(api)
+
+    summary = {"succeeded": {}, "failed": {}}
+    screen_names = list(dict.fromkeys(screen_names))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                export_account,
+                api=api,
+                screen_name=s,
+                kind=kind,
+                output=output,
+                limit=limit,
+                incremental=incremental,
+                format=format,
+                index=index,
+            ): s
+            for s in screen_names
+        }
+        for future in tqdm(
+            concurrent.futures.as_completed(futures), total=len(futures)
+        ):
+            screen_name = futures[future]
+            try:
+                summary["succeeded"][screen_name] = future.result()
+            except tweepy.error.TweepError as e:
+                # e.g., suspended or protected accounts
+                LOGGER.error(f"Exporting {kind} of {screen_name} failed: {e}")
+                summary["failed"][screen_name] = e
+
+    LOGGER.info(
+        f"Exported {kind}: {len(summary['succeeded'])} succeeded, "
+        f"{len(summary['failed'])} failed"
+    )
+    return summary
@@ -0,0 +1,124 @@
+import functools
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from plumes.config import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    key TEXT PRIMARY KEY,
+    json TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_accessed_at ON users (accessed_at);
+CREATE INDEX IF NOT EXISTS users_fetched_at ON users (fetched_at);
+"""
+
+
+def get_keys(user: dict) -> List[str]:
+    """Keys a user can be looked up by (i.e., ID and case-insensitive screen name)"""
+    return [f"id:{user['id_str']}", f"screen_name:{user['screen_name'].lower()}"]
+
+
+class UserCache:
+    """On-disk cache of user lookups with a TTL and least-recently-used eviction
+
+    Users are stored under their ID and screen name; the authenticated user is
+    also stored under `me`. Entries older than `ttl` seconds are never returned
+    and the least recently read entries are evicted beyond `max_size` entries.
+    """
+
+    def __init__(
+        self, path: Path, ttl: Optional[float] = None, max_size: Optional[int] = None
+    ):
+        self.ttl = settings.user_cache_ttl if ttl is None else ttl
+        self.max_size = settings.user_cache_size if max_size is None else max_size
+        self.lock = threading.Lock()
+
+        # concurrent exports share the cache; the lock serializes them
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+        # expired entries are purged once per session, on the first write, and
+        # periodically by long-running processes (e.g., the daemon)
+        self.purged = False
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, dict]:
+        """Fresh cached users by key; missing and expired keys are left out"""
+        keys = list(keys)
+        if self.ttl <= 0 or not keys:
+            return {}
+
+        now = time.time()
+        found = {}
+        with self.lock, self.conn:
+            # stay under SQLite's limit on query parameters
+            for start in range(0, len(keys), 500):
+                end = start + 500
+                chunk = keys[start:end]
+                rows = self.conn.execute(
+                    "SELECT key, json FROM users WHERE fetched_at > ? "
+                    f"AND key IN ({', '.join('?' * len(chunk))})",
+                    [now - self.ttl, *chunk],
+                ).fetchall()
+                found.update((k, json.loads(j)) for k, j in rows)
+
+            self.conn.executemany(
+                "UPDATE users SET accessed_at = ? WHERE key = ?",
+                ((now, k) for k in found),
+            )
+
+        return found
+
+    def purge(self):
+        """Delete expired entries, walking the fetched_at index"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM users WHERE fetched_at <= ?", (time.time() - self.ttl,)
+            )
+            self.purged = True
+
+    def put(self, users: Iterable[dict], me: bool = False):
+        """Cache freshly fetched users, evicting the least recently used ones"""
+        if self.ttl <= 0:
+            return
+        if not self.purged:
+            self.purge()
+
+        now = time.time()
+        rows = []
+        for u in users:
+            keys = get_keys(u) + (["me"] if me else [])
+            rows.extend((k, json.dumps(u), now, now) for k in keys)
+
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?)", rows
+            )
+            # only evict when over the limit, walking the accessed_at index from
+            # its oldest end rather than ranking the whole table
+            count = self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+            if count > self.max_size:
+                self.conn.execute(
+                    "DELETE FROM users WHERE key IN "
+                    "(SELECT key FROM users ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_size,),
+                )
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+
+@functools.lru_cache(maxsize=None)
+def get_user_cache() -> UserCache:
+    """Process-wide user cache shared by all commands"""
+    return UserCache(Path(settings.user_cache_path).expanduser())
@@ -1,20 +1,32 @@
-import datetime
-import email.utils as eu
 import json
 import logging
-import logging.config
+import signal
 import textwrap
+import threading
+from contextlib import closing
 from pathlib import Path
 from typing import Optional
 
-import fire
-import toml
-import tweepy
-
-import plumes.utilities as pu
+import plumes.metrics as pm
 from plumes.config import settings, user_config_path
+from plumes.lazy import lazy_import
+
+# only load what a command uses (e.g., no network stack for offline audits)
+fire = lazy_import("fire")
+np = lazy_import("numpy")
+toml = lazy_import("toml")
+tweepy = lazy_import("tweepy")
+pa = lazy_import("plumes.actions")
+pau = lazy_import("plumes.audit")
+pb = lazy_import("plumes.batch")
+pd = lazy_import("plumes.daemon")
+pdiff = lazy_import("plumes.diff")
+pfake = lazy_import("plumes.fakeapi")
+pf = lazy_import("plumes.formats")
+pi = lazy_import("plumes.index")
+ps = lazy_import("plumes.store")
+pu = lazy_import("plumes.utilities")
 
-logging.config.dictConfig(settings.logging)
 LOGGER = logging.getLogger("plumes")
 
 
@@ -99,6 +111,12 @@ def friends(
     screen_name: Optional[str] = None,
     limit: Optional[int] = None,
     output: Optional[str] = None,
+    jsonl: bool = False,
+    resume: bool = False,
+    format: Optional[str] = None,
+    index: bool = False,
+    by_ids: bool = False,
+    previous: Optional[str] = None,
 ):
     """Get JSON array of friends
 
@@ -106,30 +124,72 @@ def friends(
         screen_name (Optional[str], optional): Target user's screen name (i.e., Twitter handle). If none is given, authenticated user is used. Defaults to None.
         limit (Optional[int], optional): Max number of users to fetch. Defaults to None.
         output (Optional[str], optional): Output path for JSON file. Defaults to None.
+        jsonl (bool, optional): Stream output as JSON Lines, written page by page. Defaults to False.
+        resume (bool, optional): Resume an interrupted JSON Lines export from its checkpoint. Defaults to False.
+        format (Optional[str], optional): Output format (json, compact, jsonl, or csv), optionally compressed with a .gz or .xz suffix (e.g., jsonl.gz). Defaults to None (i.e., json, or jsonl when streaming).
+        index (bool, optional): Also write an offset index of the export for instant lookups (e.g., by view_user); needs the jsonl format. Defaults to False.
+        by_ids (bool, optional): Page user IDs and hydrate them in batches, which needs far fewer rate-limited calls; can't be resumed. Defaults to False.
+        previous (Optional[str], optional): Previous export whose users are reused instead of re-fetched when using `by_ids`; CSV exports and change logs only have some fields, so their users are re-fetched. Defaults to None.
     """
     # get api and user object
     api = pu.get_api()
-    source_user = pu.get_user(screen_name=screen_name)
+    # a cached user's counts can be stale, and would cut the export short
+    source_user = pu.get_user(screen_name=screen_name, refresh=True)
 
     # check limit for progress bar
     if not limit:  # pragma: no cover
         limit = source_user.friends_count
 
     # ensure output location
-    fname = f"{source_user.screen_name}-friends.json"
+    format = format or ("jsonl" if jsonl or resume else "json")
+    base, _ = pf.parse_format(format)
+    fname = f"{source_user.screen_name}-friends{pf.get_extension(format)}"
     path = pu.set_output(fname=fname, path=output)
+    if index:
+        pi.check_indexable(path)
 
     # get users
     LOGGER.info(f"Fetching {limit} friends")
-    pu.get_tweepy_objects(
-        func=api.friends, screen_name=screen_name, output=path, total=limit
-    )
+    if by_ids:
+        pu.get_users_by_ids(
+            api=api,
+            ids_func=api.friends_ids,
+            screen_name=screen_name,
+            output=path,
+            total=limit,
+            jsonl=base == "jsonl",
+            compact=base == "compact",
+            previous=Path(previous) if previous else None,
+            endpoint="/friends/ids",
+            resume=resume,
+        )
+    else:
+        pu.get_tweepy_objects(
+            func=api.friends,
+            screen_name=screen_name,
+            output=path,
+            total=limit,
+            jsonl=base == "jsonl",
+            compact=base == "compact",
+            resume=resume,
+            api=api,
+            endpoint="/friends/list",
+        )
+
+    if index:
+        pi.build_index(path)
 
 
 def followers(
     screen_name: Optional[str] = None,
     limit: Optional[int] = None,
     output: Optional[str] = None,
+    jsonl: bool = False,
+    resume: bool = False,
+    format: Optional[str] = None,
+    index: bool = False,
+    by_ids: bool = False,
+    previous: Optional[str] = None,
 ):
     """Get JSON array of followers
 
@@ -137,30 +197,71 @@ def followers(
         screen_name (Optional[str], optional): Target user's screen name (i.e., Twitter handle). If none is given, authenticated user is used. Defaults to None.
         limit (Optional[int], optional): Max number of users to fetch. Defaults to None.
         output (Optional[str], optional): Output path for JSON file. Defaults to None.
+        jsonl (bool, optional): Stream output as JSON Lines, written page by page. Defaults to False.
+        resume (bool, optional): Resume an interrupted JSON Lines export from its checkpoint. Defaults to False.
+        format (Optional[str], optional): Output format (json, compact, jsonl, or csv), optionally compressed with a .gz or .xz suffix (e.g., jsonl.gz). Defaults to None (i.e., json, or jsonl when streaming).
+        index (bool, optional): Also write an offset index of the export for instant lookups (e.g., by view_user); needs the jsonl format. Defaults to False.
+        by_ids (bool, optional): Page user IDs and hydrate them in batches, which needs far fewer rate-limited calls; can't be resumed. Defaults to False.
+        previous (Optional[str], optional): Previous export whose users are reused instead of re-fetched when using `by_ids`; CSV exports and change logs only have some fields, so their users are re-fetched. Defaults to None.
     """
     # get api and user object
     api = pu.get_api()
-    source_user = pu.get_user(screen_name=screen_name)
+    # a cached user's counts can be stale, and would cut the export short
+    source_user = pu.get_user(screen_name=screen_name, refresh=True)
 
     # check limit for progress bar
     if not limit:  # pragma: no cover
         limit = source_user.followers_count
 
     # ensure output location
-    fname = f"{source_user.screen_name}-followers.json"
+    format = format or ("jsonl" if jsonl or resume else "json")
+    base, _ = pf.parse_format(format)
+    fname = f"{source_user.screen_name}-followers{pf.get_extension(format)}"
     path = pu.set_output(fname=fname, path=output)
+    if index:
+        pi.check_indexable(path)
 
     # get users
     LOGGER.info(f"Fetching {limit} followers")
-    pu.get_tweepy_objects(
-        func=api.followers, screen_name=screen_name, output=path, total=limit
-    )
+    if by_ids:
+        pu.get_users_by_ids(
+            api=api,
+            ids_func=api.followers_ids,
+            screen_name=screen_name,
+            output=path,
+            total=limit,
+            jsonl=base == "jsonl",
+            compact=base == "compact",
+            previous=Path(previous) if previous else None,
+            endpoint="/followers/ids",
+            resume=resume,
+        )
+    else:
+        pu.get_tweepy_objects(
+            func=api.followers,
+            screen_name=screen_name,
+            output=path,
+            total=limit,
+            jsonl=base == "jsonl",
+            compact=base == "compact",
+            resume=resume,
+            api=api,
+            endpoint="/followers/list",
+        )
+
+    if index:
+        pi.build_index(path)
 
 
 def favorites(
     screen_name: Optional[str] = None,
     limit: Optional[int] = None,
     output: Optional[str] = None,
+    jsonl: bool = False,
+    resume: bool = False,
+    format: Optional[str] = None,
+    index: bool = False,
+    incremental: bool = False,
 ):
     """Get JSON array of favourited tweets.
 
@@ -168,30 +269,57 @@ def favorites(
         screen_name (Optional[str], optional): Target user's screen name (i.e., Twitter handle). If none is given, authenticated user is used. Defaults to None.
         limit (Optional[int], optional): Max number of users to fetch. Defaults to None.
         output (Optional[str], optional): Output path for JSON file. Defaults to None.
+        jsonl (bool, optional): Stream output as JSON Lines, written page by page. Defaults to False.
+        resume (bool, optional): Resume an interrupted JSON Lines export from its checkpoint. Defaults to False.
+        format (Optional[str], optional): Output format (json, compact, jsonl, or csv), optionally compressed with a .gz or .xz suffix (e.g., jsonl.gz). Defaults to None (i.e., json, or jsonl when streaming).
+        index (bool, optional): Also write an offset index of the export for instant lookups (e.g., by view_user); needs the jsonl format. Defaults to False.
+        incremental (bool, optional): Only fetch tweets newer than those in an existing export and merge them into it. Defaults to False.
     """
     # get api and user object
     api = pu.get_api()
-    source_user = pu.get_user(screen_name=screen_name)
+    # a cached user's counts can be stale, and would cut the export short
+    source_user = pu.get_user(screen_name=screen_name, refresh=True)
 
     # check limit for progress bar
     if not limit:  # pragma: no cover
         limit = source_user.statuses_count
 
     # ensure output location
-    fname = f"{source_user.screen_name}-favorites.json"
+    format = format or ("jsonl" if jsonl or resume else "json")
+    base, _ = pf.parse_format(format)
+    fname = f"{source_user.screen_name}-favorites{pf.get_extension(format)}"
     path = pu.set_output(fname=fname, path=output)
+    if index:
+        pi.check_indexable(path)
 
     # get tweets
     LOGGER.info(f"Fetching {limit} favourited tweets")
     pu.get_tweepy_objects(
-        func=api.favorites, screen_name=screen_name, output=path, total=limit
+        func=api.favorites,
+        screen_name=screen_name,
+        output=path,
+        total=limit,
+        jsonl=base == "jsonl",
+        compact=base == "compact",
+        resume=resume,
+        incremental=incremental,
+        api=api,
+        endpoint="/favorites/list",
     )
 
+    if index:
+        pi.build_index(path)
+
 
 def tweets(
     screen_name: Optional[str] = None,
     limit: Optional[int] = None,
     output: Optional[str] = None,
+    jsonl: bool = False,
+    resume: bool = False,
+    format: Optional[str] = None,
+    index: bool = False,
+    incremental: bool = False,
 ):
     """Get JSON array of tweets
 
@@ -199,23 +327,135 @@ def tweets(
         screen_name (Optional[str], optional): Target user's screen name (i.e., Twitter handle). If none is given, authenticated user is used. Defaults to None.
         limit (Optional[int], optional): Max number of users to fetch. Defaults to None.
         output (Optional[str], optional): Output path for JSON file. Defaults to None.
+        jsonl (bool, optional): Stream output as JSON Lines, written page by page. Defaults to False.
+        resume (bool, optional): Resume an interrupted JSON Lines export from its checkpoint. Defaults to False.
+        format (Optional[str], optional): Output format (json, compact, jsonl, or csv), optionally compressed with a .gz or .xz suffix (e.g., jsonl.gz). Defaults to None (i.e., json, or jsonl when streaming).
+        index (bool, optional): Also write an offset index of the export for instant lookups (e.g., by view_user); needs the jsonl format. Defaults to False.
+        incremental (bool, optional): Only fetch tweets newer than those in an existing export and merge them into it. Defaults to False.
     """
     # get api and user object
     api = pu.get_api()
-    source_user = pu.get_user(screen_name=screen_name)
+    # a cached user's counts can be stale, and would cut the export short
+    source_user = pu.get_user(screen_name=screen_name, refresh=True)
 
     # check limit for progress bar
     if not limit:  # pragma: no cover
         limit = source_user.statuses_count
 
     # ensure output location
-    fname = f"{source_user.screen_name}-tweets.json"
+    format = format or ("jsonl" if jsonl or resume else "json")
+    base, _ = pf.parse_format(format)
+    fname = f"{source_user.screen_name}-tweets{pf.get_extension(format)}"
     path = pu.set_output(fname=fname, path=output)
+    if index:
+        pi.check_indexable(path)
 
     # get tweets
     LOGGER.info(f"Fetching {limit} tweets")
     pu.get_tweepy_objects(
-        func=api.user_timeline, screen_name=screen_name, output=path, total=limit
+        func=api.user_timeline,
+        screen_name=screen_name,
+        output=path,
+        total=limit,
+        jsonl=base == "jsonl",
+        compact=base == "compact",
+        resume=resume,
+        incremental=incremental,
+        api=api,
+        endpoint="/statuses/user_timeline",
+    )
+
+    if index:
+        pi.build_index(path)
+
+
+def batch(
+    screen_names: str,
+    kind: str = "friends",
+    limit: Optional[int] = None,
+    output: Optional[str] = None,
+    incremental: bool = False,
+    workers: Optional[int] = None,
+    format: str = "jsonl",
+    index: bool = False,
+):
+    """Export the friends, followers, tweets or favorites of many users concurrently
+
+    Args:
+        screen_names (str): Comma-separated screen names, or path to a file with one screen name per line
+        kind (str, optional): Export kind (friends, followers, tweets, or favorites). Defaults to "friends".
+        limit (Optional[int], optional): Max number of users or tweets to fetch per account. Defaults to None.
+        output (Optional[str], optional): Output directory for the exports. Defaults to None.
+        incremental (bool, optional): Only fetch tweets newer than those in existing exports and merge them into them. Defaults to False.
+        workers (Optional[int], optional): Number of accounts exported at once. Defaults to None.
+        format (str, optional): Output format (json, compact, jsonl, or csv), optionally compressed with a .gz or .xz suffix (e.g., jsonl.gz). Defaults to "jsonl".
+        index (bool, optional): Also write an offset index of every export for instant lookups (e.g., by view_user); needs the jsonl format. Defaults to False.
+    """
+    pb.export_accounts(
+        api=pu.get_api(),
+        screen_names=pu.parse_list(screen_names),
+        kind=kind,
+        output=output,
+        limit=limit,
+        incremental=incremental,
+        workers=workers,
+        format=format,
+        index=index,
+    )
+
+
+def sync(
+    path: str,
+    source: Optional[str] = None,
+    kind: Optional[str] = None,
+    db: Optional[str] = None,
+):
+    """Sync an export into the local plumes database
+
+    Args:
+        path (str): Path to JSON file of users or tweets (e.g., output of friends())
+        source (Optional[str], optional): Account the export belongs to. Defaults to the screen name in the file name.
+        kind (Optional[str], optional): Export kind (friends, followers, tweets, or favorites). Defaults to the kind in the file name.
+        db (Optional[str], optional): Path to plumes database. Defaults to None.
+    """
+    path = Path(path)
+
+    # exports are named `<screen_name>-<kind>.json`
+    name, _, name_kind = path.name.split(".")[0].rpartition("-")
+    source = source or name
+    kind = kind or name_kind
+
+    db = Path(db) if db else Path(settings.store_path).expanduser()
+    records = pu.load_records(path)
+    with closing(ps.connect(db)) as conn:
+        count = ps.sync_records(conn, records, source=source, kind=kind)
+    LOGGER.info(f"Synced {count} {kind} of {source} into {db.resolve()}")
+
+
+def diff(old: str, new: str, output: Optional[str] = None, only: Optional[str] = None):
+    """Compare two exports of the same kind (e.g., yesterday's and today's followers)
+
+    Args:
+        old (str): Path to older JSON file of users or tweets
+        new (str): Path to newer JSON file of users or tweets
+        output (Optional[str], optional): Output path for JSON Lines change log, which audit_users and audit_tweets can read. Defaults to None.
+        only (Optional[str], optional): Comma-separated change types to log (added, removed, changed). Defaults to None.
+    """
+    old = Path(old)
+    new = Path(new)
+
+    # fire parses comma-separated values into tuples
+    if isinstance(only, str):
+        only = only.split(",")
+
+    # ensure output location
+    fname = f"{new.name.split('.')[0]}-changes.jsonl"
+    path = pu.set_output(fname=fname, path=output)
+
+    counts = pdiff.diff_exports(old=old, new=new, output=path, only=only)
+    LOGGER.info(
+        f"Added {counts['added']}, removed {counts['removed']}, "
+        f"changed {counts['changed']}"
     )
 
 
@@ -235,11 +475,19 @@ def audit_users(  # noqa C901
     prune: bool = False,
     befriend: bool = False,
     bool_or: bool = False,
+    where: Optional[str] = None,
+    kind: Optional[str] = None,
+    source: Optional[str] = None,
+    friends: Optional[str] = None,
+    followers: Optional[str] = None,
+    targets: Optional[str] = None,
+    dry_run: bool = False,
+    plan: Optional[str] = None,
 ):
     """Audit and review users given criteria
 
     Args:
-        path (str): Path to JSON file of users (e.g., output of friends())
+        path (str): Path to export of users (e.g., output of friends()) or plumes database
         min_followers (Optional[int], optional): Min number of followers. Defaults to None.
         max_followers (Optional[int], optional): Max number of followers. Defaults to None.
         min_friends (Optional[int], optional): Min number of friends. Defaults to None.
@@ -254,92 +502,83 @@ def audit_users(  # noqa C901
         prune (bool, optional): Unfollow identified users. Defaults to False.
         befriend (bool, optional): Follow identified users. Defaults to False.
         bool_or (bool, optional): Switch to boolean OR for conditions. Defaults to False.
+        where (Optional[str], optional): Filter expression over record fields (e.g., "followers_count < 50 and days_since_status > 365"). Defaults to None.
+        kind (Optional[str], optional): User collection to audit when `path` is a plumes database (friends or followers). Defaults to None.
+        source (Optional[str], optional): Account whose collection to audit when `path` is a plumes database. Defaults to None.
+        friends (Optional[str], optional): Path to your friends export, enabling the `following` and `mutual` fields of `where`. Defaults to None.
+        followers (Optional[str], optional): Path to your followers export, enabling the `follows_back`, `mutual`, and `fan` fields of `where`. Defaults to None.
+        targets (Optional[str], optional): Comma-separated screen names or IDs, or path to a file with one per line, to audit instead of the whole JSON Lines export; they're read through its offset index. Defaults to None.
+        dry_run (bool, optional): Write the actions to a plan file for `run_plan` instead of running them. Defaults to False.
+        plan (Optional[str], optional): Output path for the dry run's plan file. Defaults to None.
     """
 
+    # compile the filter up front so bad expressions fail before loading data
+    predicate = None
+    if where is not None:
+        predicate = pau.compile_where(where, fields=pau.USER_FIELDS)
+
+    # each criterion identifies users for which `field op value` holds
+    criteria = [
+        ("followers_count", "<", min_followers),
+        ("followers_count", ">", max_followers),
+        ("friends_count", "<", min_friends),
+        ("friends_count", ">", max_friends),
+        ("last_status", "<", None if days is None else pau.get_date_limit(days)),
+        ("statuses_count", "<", min_tweets),
+        ("statuses_count", ">", max_tweets),
+        ("favourites_count", "<", min_favourites),
+        ("favourites_count", ">", max_favourites),
+        ("tff_ratio", "<", min_ratio),
+        ("tff_ratio", ">", max_ratio),
+    ]
+    criteria = [c for c in criteria if c[2] is not None]
+
     # load users data
     path = Path(path)
-    with open(path) as f:
-        users = json.load(f)
-    LOGGER.info(f"Loaded {len(users)} users")
-
-    # init list of users to prune
-    identified_users = set()
-
-    # iterate and identify prunable users
-    for u in sorted(users, key=lambda x: x["screen_name"].lower()):
-        failed_clauses = []
-
-        if min_followers is not None:
-            failed_clauses.append(u["followers_count"] < min_followers)
-
-        if max_followers is not None:
-            failed_clauses.append(u["followers_count"] > max_followers)
-
-        if min_friends is not None:
-            failed_clauses.append(u["friends_count"] < min_friends)
-
-        if max_friends is not None:
-            failed_clauses.append(u["friends_count"] > max_friends)
-
-        if days is not None:
-            today = datetime.date.today()
-            limit = today - datetime.timedelta(days=days)
-            try:
-                last_tweet = eu.parsedate_to_datetime(u["status"]["created_at"])
-                failed_clauses.append(last_tweet.date() < limit)
-            except KeyError:
-                # no tweets
-                failed_clauses.append(True)
-
-        if min_tweets is not None:
-            failed_clauses.append(u["statuses_count"] < min_tweets)
-
-        if max_tweets is not None:
-            failed_clauses.append(u["statuses_count"] > max_tweets)
-
-        if min_favourites is not None:
-            failed_clauses.append(u["favourites_count"] < min_favourites)
-
-        if max_favourites is not None:
-            failed_clauses.append(u["favourites_count"] > max_favourites)
-
-        if min_ratio is not None:
-            failed_clauses.append(
-                pu.calculate_tff_ratio(
-                    followers=u["followers_count"], friends=u["friends_count"]
+    with pm.get_metrics().stage("load"):
+        if ps.is_store(path):
+            # with AND, let the store's indexes pre-filter the users
+            with closing(ps.connect(path)) as conn:
+                users = ps.query_users(
+                    conn,
+                    kind=kind or "friends",
+                    source=source,
+                    criteria=None if bool_or else criteria,
                 )
-                < min_ratio
-            )
+        else:
+            targets = None if targets is None else pu.parse_list(targets)
+            users = pau.load_users(path, targets=targets)
 
-        if max_ratio is not None:
-            failed_clauses.append(
-                pu.calculate_tff_ratio(
-                    followers=u["followers_count"], friends=u["friends_count"]
-                )
-                > max_ratio
-            )
+        # hash sets of ids to join users against their relationships
+        friend_ids = pau.load_ids(Path(friends)) if friends else None
+        follower_ids = pau.load_ids(Path(followers)) if followers else None
+    LOGGER.info(f"Loaded {len(users)} users")
 
-        if len(failed_clauses) > 0:
-            if (bool_or and any(failed_clauses)) or all(failed_clauses):
-                LOGGER.info(f"Identified {u['screen_name']}")
-                identified_users.add(u["screen_name"])
+    with pm.get_metrics().stage("audit"):
+        # evaluate every criterion over whole columns at once
+        cols = pau.get_user_columns(users, friends=friend_ids, followers=follower_ids)
+        clauses = pau.evaluate_criteria(cols, criteria)
+        if predicate is not None:
+            clauses.append(predicate(cols))
+
+        mask = pau.combine_clauses(clauses, size=len(users), bool_or=bool_or)
+    # act on IDs, since screen names can change before a plan is run
+    identified_users = dict(zip(cols["id_str"][mask], cols["screen_name"][mask]))
+    for u in sorted(identified_users.values(), key=str.lower):
+        LOGGER.info(f"Identified {u}")
 
     LOGGER.info(f"Identified {len(identified_users)} users")
-    if prune:  # pragma: no cover
-        for u in identified_users:
-            LOGGER.info(f"Unfollowing {u}")
-
-            try:
-                pu.get_api().destroy_friendship(u)
-            except tweepy.error.TweepError as e:
-                LOGGER.error(e)
-    if befriend:  # pragma: no cover
-        for u in identified_users:
-            LOGGER.info(f"Following {u}")
-            try:
-                pu.get_api().create_friendship(u)
-            except tweepy.error.TweepError as e:
-                LOGGER.error(e)
+    targets = sorted(identified_users, key=lambda i: identified_users[i].lower())
+    actions = {"unfollow": prune, "follow": befriend}
+    actions = {a: targets for a, enabled in actions.items() if enabled}
+    if actions and dry_run:
+        pa.write_plan(
+            actions,
+            pu.set_output(fname="plumes-plan.jsonl", path=plan),
+            labels=identified_users,
+        )
+    elif actions:  # pragma: no cover
+        pa.execute_plan(actions, api=pu.get_api())
 
 
 def audit_tweets(  # noqa C901
@@ -354,12 +593,20 @@ def audit_tweets(  # noqa C901
     self_favorited: Optional[bool] = None,
     prune: bool = False,
     favorite: bool = False,
+    unfavorite: bool = False,
     bool_or: bool = False,
+    where: Optional[str] = None,
+    kind: Optional[str] = None,
+    source: Optional[str] = None,
+    targets: Optional[str] = None,
+    dry_run: bool = False,
+    plan: Optional[str] = None,
 ):
     """Audit and review tweets given criteria
 
     Args:
-        days (Optional[int], optional): Days since tweeted. Defaults to None.
+        path (str): Path to export of tweets (e.g., output of tweets()), Twitter archive (its zip, folder, or tweet.js/like.js) or plumes database
+        days (Optional[int], optional): Days since tweeted (for archived likes, the liked tweet's age; archives don't record when it was liked). Defaults to None.
         min_likes (Optional[int], optional): Min number of favourites. Defaults to None.
         max_likes (Optional[int], optional): Max number of favourites. Defaults to None.
         min_retweets (Optional[int], optional): Min number of retweets. Defaults to None.
@@ -369,89 +616,140 @@ def audit_tweets(  # noqa C901
         self_favorited (Optional[bool], optional): Check if tweet is self-liked. Defaults to None.
         prune (bool, optional): Prune and destroy identified tweets. Defaults to False.
         favorite (bool, optional): Like identified tweets. Defaults to False.
+        unfavorite (bool, optional): Unlike identified tweets (e.g., old likes from a Twitter archive). Defaults to False.
         bool_or (bool, optional): Switch to boolean OR for conditions. Defaults to False.
+        where (Optional[str], optional): Filter expression over record fields (e.g., "favorite_count < 5 and days_since_created > 90"). Defaults to None.
+        kind (Optional[str], optional): Tweet collection to audit when `path` is a plumes database or Twitter archive (tweets or favorites). Defaults to None.
+        source (Optional[str], optional): Account whose collection to audit when `path` is a plumes database. Defaults to None.
+        targets (Optional[str], optional): Comma-separated tweet IDs, or path to a file with one per line, to audit instead of the whole JSON Lines export; they're read through its offset index. Defaults to None.
+        dry_run (bool, optional): Write the actions to a plan file for `run_plan` instead of running them. Defaults to False.
+        plan (Optional[str], optional): Output path for the dry run's plan file. Defaults to None.
     """
+    # compile the filter up front so bad expressions fail before loading data
+    predicate = None
+    if where is not None:
+        predicate = pau.compile_where(where, fields=pau.TWEET_FIELDS)
+
+    # each criterion identifies tweets for which `field op value` holds
+    criteria = [
+        ("created_at", "<", None if days is None else pau.get_date_limit(days)),
+        ("favorite_count", "<", min_likes),
+        ("favorite_count", ">", max_likes),
+        ("retweet_count", "<", min_retweets),
+        ("retweet_count", ">", max_retweets),
+        ("like_retweet_ratio", "<", min_ratio),
+        ("like_retweet_ratio", ">", max_ratio),
+        ("favorited", "==", self_favorited),
+    ]
+    criteria = [c for c in criteria if c[2] is not None]
+
     # load data
     path = Path(path)
-    with open(path) as f:
-        tweets = json.load(f)
+    with pm.get_metrics().stage("load"):
+        if ps.is_store(path):
+            # with AND, let the store's indexes pre-filter the tweets
+            with closing(ps.connect(path)) as conn:
+                tweets = ps.query_tweets(
+                    conn,
+                    kind=kind or "tweets",
+                    source=source,
+                    criteria=None if bool_or else criteria,
+                )
+        else:
+            targets = None if targets is None else pu.parse_list(targets)
+            tweets = pau.load_tweets(path, targets=targets, kind=kind)
     LOGGER.info(f"Loaded {len(tweets)} tweets")
 
-    # init set of users to prune
-    identified_tweets = set()
+    with pm.get_metrics().stage("audit"):
+        # evaluate every criterion over whole columns at once
+        cols = pau.get_tweet_columns(tweets)
+        clauses = pau.evaluate_criteria(cols, criteria)
+        if predicate is not None:
+            clauses.append(predicate(cols))
 
-    # iterate and identify prunable users
-    for t in tweets:
-        text = textwrap.shorten(t["text"], width=settings.textwrap_width)
-        failed_clauses = []
+        mask = pau.combine_clauses(clauses, size=len(tweets), bool_or=bool_or)
+    identified_tweets = set(cols["id_str"][mask])
+    for i in np.flatnonzero(mask):
+        text = textwrap.shorten(tweets[i].text, width=settings.textwrap_width)
+        LOGGER.info(f'Identified "{text}"')
 
-        if days is not None:
-            today = datetime.date.today()
-            limit = today - datetime.timedelta(days=days)
-            tweet_dt = eu.parsedate_to_datetime(t["created_at"])
-            failed_clauses.append(tweet_dt.date() < limit)
+    LOGGER.info(f"Identified {len(identified_tweets)} tweets")
+    targets = sorted(identified_tweets)
+    actions = {"delete": prune, "favorite": favorite, "unfavorite": unfavorite}
+    actions = {a: targets for a, enabled in actions.items() if enabled}
+    if actions and dry_run:
+        pa.write_plan(actions, pu.set_output(fname="plumes-plan.jsonl", path=plan))
+    elif actions:  # pragma: no cover
+        pa.execute_plan(actions, api=pu.get_api())
 
-        if min_likes is not None:
-            failed_clauses.append(t["favorite_count"] < min_likes)
 
-        if max_likes is not None:
-            failed_clauses.append(t["favorite_count"] > max_likes)
+def run_plan(path: str, workers: Optional[int] = None):
+    """Run exactly the actions of a plan file (e.g., from a dry run of audit_users)
 
-        if min_retweets is not None:
-            failed_clauses.append(t["retweet_count"] < min_retweets)
+    Args:
+        path (str): Path to plan file
+        workers (Optional[int], optional): Number of actions run at once. Defaults to None.
+    """
+    plan = pa.load_plan(Path(path))
+    pa.execute_plan(plan, api=pu.get_api(), workers=workers)
 
-        if max_retweets is not None:
-            failed_clauses.append(t["retweet_count"] > max_retweets)
 
-        if min_ratio is not None:
-            failed_clauses.append(
-                pu.calculate_like_retweet_ratio(
-                    likes=t["favorite_count"], retweets=t["retweet_count"]
-                )
-                < min_ratio
-            )
+def index(path: str):
+    """Write (or refresh) the offset index of a JSON Lines export for instant lookups
 
-        if max_ratio is not None:
-            failed_clauses.append(
-                pu.calculate_like_retweet_ratio(
-                    likes=t["favorite_count"], retweets=t["retweet_count"]
-                )
-                > max_ratio
-            )
+    Args:
+        path (str): Path to JSON Lines file of users or tweets (e.g., output of friends())
+    """
+    index_path = pi.build_index(Path(path))
+    LOGGER.info(f"Wrote index {index_path.resolve()}")
 
-        if self_favorited is not None:
-            failed_clauses.append(t["favorited"] == self_favorited)
 
-        if len(failed_clauses) > 0:
-            if (bool_or and any(failed_clauses)) or all(failed_clauses):
-                LOGGER.info(f'Identified "{text}"')
-                identified_tweets.add(t["id_str"])
+def view_user(user: str, refresh: bool = False, path: Optional[str] = None):
+    """View a user's raw JSON
 
-    LOGGER.info(f"Identified {len(identified_tweets)} tweets")
-    if prune:  # pragma: no cover
-        for t in identified_tweets:
-            LOGGER.info(f"Deleting {t}")
+    Args:
+        user (str): User's screen name (or ID when looking it up in an export)
+        refresh (bool, optional): Fetch the user even if it was recently cached. Defaults to False.
+        path (Optional[str], optional): JSON Lines export of users to look the user up in (through its offset index) instead of Twitter. Defaults to None.
+    """
+    if path:
+        with pi.IndexedExport(Path(path)) as export:
+            record = export.find(user)
+        if record is None:
+            LOGGER.error(f"{user} isn't in {path}")
+            return
+    else:
+        record = pu.get_user(screen_name=user, refresh=refresh)._json
 
-            try:
-                pu.get_api().destroy_status(t)
-            except tweepy.error.TweepError as e:
-                LOGGER.error(e)
-    if favorite:  # pragma: no cover
-        for t in identified_tweets:
-            LOGGER.info(f"Favoriting {t}")
-            pu.get_api().create_favorite(t)
+    print(
+        json.dumps(
+            record,
+            indent=4,
+            sort_keys=True,
+            default=lambda o: "<not serializable>",
+        )
+    )
 
 
-def view_user(user: str):
-    """View a user's raw JSON
+def view_tweet(tweet: str, path: Optional[str] = None):
+    """View a tweet's raw JSON
 
     Args:
-        user (str): User's screen name
+        tweet (str): Tweet's ID
+        path (Optional[str], optional): JSON Lines export of tweets to look the tweet up in (through its offset index) instead of Twitter. Defaults to None.
     """
-    user = pu.get_api().get_user(user)
+    if path:
+        with pi.IndexedExport(Path(path)) as export:
+            record = export.find(str(tweet))
+        if record is None:
+            LOGGER.error(f"{tweet} isn't in {path}")
+            return
+    else:
+        record = pu.get_tweet(tweet)._json
+
     print(
         json.dumps(
-            user._json,
+            record,
             indent=4,
             sort_keys=True,
             default=lambda o: "<not serializable>",
@@ -459,5 +757,100 @@ def view_user(user: str):
     )
 
 
+def fake_api(
+    users: Optional[str] = None,
+    tweets: Optional[str] = None,
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    latency: float = 0,
+    page_size: Optional[int] = None,
+    window: float = 900,
+    limit: Optional[int] = None,
+    fail_every: int = 0,
+):  # pragma: no cover
+    """Serve a local stand-in for the Twitter API (set `api_url` to use it)
+
+    Args:
+        users (Optional[str], optional): Path to JSON file of users served as every account's friends and followers. Defaults to None.
+        tweets (Optional[str], optional): Path to JSON file of tweets served as every account's tweets and favorites. Defaults to None.
+        host (str, optional): Address to listen on. Defaults to "127.0.0.1".
+        port (int, optional): Port to listen on. Defaults to 8080.
+        latency (float, optional): Seconds added to every response. Defaults to 0.
+        page_size (Optional[int], optional): Max records per page, whatever the requested count. Defaults to None.
+        window (float, optional): Seconds per rate limit window. Defaults to 900.
+        limit (Optional[int], optional): Requests per window of every rate limited endpoint. Defaults to Twitter's limits.
+        fail_every (int, optional): Reject every n-th request with a 429. Defaults to 0.
+    """
+    twitter = pfake.FakeTwitter(
+        users=pu.load_records(Path(users)) if users else [],
+        tweets=pu.load_records(Path(tweets)) if tweets else [],
+        latency=latency,
+        page_size=page_size,
+        window=window,
+        limits={k: limit for k in pfake.RATE_LIMITS} if limit else None,
+        fail_every=fail_every,
+    )
+    server = pfake.FakeTwitterServer((host, port), twitter)
+    LOGGER.info(f"Serving a fake Twitter API on {server.url}")
+    LOGGER.info(f"Use it with `export PLUMES_API_URL={server.url}`")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def daemon(host: Optional[str] = None, port: Optional[int] = None):  # pragma: no cover
+    """Run the configured jobs on a schedule and serve ad-hoc commands over HTTP
+
+    Args:
+        host (Optional[str], optional): Address to listen on. Defaults to the `daemon_host` setting.
+        port (Optional[int], optional): Port to listen on. Defaults to the `daemon_port` setting.
+    """
+    # servers never return, so they can't be run as jobs or ad-hoc commands;
+    # over HTTP, only the commands in `pd.HTTP_COMMANDS` can be run
+    commands = {
+        k: v for k, v in get_commands().items() if k not in ["daemon", "fake_api"]
+    }
+    jobs = pd.load_jobs(settings.daemon_jobs, commands)
+    runner = pd.Daemon(commands, jobs)
+
+    host = settings.daemon_host if host is None else host
+    port = settings.daemon_port if port is None else port
+    token_path = Path(settings.daemon_token_path).expanduser()
+    server = pd.DaemonServer((host, port), runner, pd.write_token(token_path))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    LOGGER.info(f"Serving plumes commands on {server.url}")
+    LOGGER.info(f"Authenticate with the bearer token in {token_path}")
+    LOGGER.info(f"Scheduled jobs: {', '.join(runner.jobs) or 'none'}")
+
+    # e.g., `kill` from a service manager
+    signal.signal(signal.SIGTERM, lambda *args: runner.stop())
+    try:
+        runner.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def get_commands() -> dict:
+    """Functions of this module exposed as commands (i.e., not its imports)"""
+    return {
+        name: obj
+        for name, obj in globals().items()
+        if callable(obj)
+        and getattr(obj, "__module__", None) == __name__
+        and name not in ["get_commands", "main"]
+    }
+
+
 def main():  # pragma: no cover
-    fire.Fire()
+    # listing modules as commands would import them (e.g., for `--help`)
+    try:
+        fire.Fire(get_commands(), name="plumes")
+    finally:
+        pm.get_metrics().emit()
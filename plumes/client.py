@@ -0,0 +1,130 @@
+import functools
+import threading
+import time
+import types
+from types import SimpleNamespace
+
+import requests
+import tweepy
+from requests.adapters import HTTPAdapter
+
+import plumes.metrics as pm
+from plumes.config import settings
+
+TWITTER_API_URL = "https://api.twitter.com"
+
+
+class PooledSession(requests.Session):
+    """Session sharing one pooled adapter, kept open after tweepy closes it"""
+
+    def __init__(self):
+        super().__init__()
+        adapter = get_http_adapter()
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        # send API calls to a stand-in server (e.g., `plumes fake_api`) if set
+        if settings.api_url:
+            url = url.replace(TWITTER_API_URL, settings.api_url.rstrip("/"), 1)
+
+        start = time.perf_counter()
+        status = "error"
+        size = 0
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            status = str(response.status_code)
+            size = len(response.content)
+            return response
+        finally:
+            pm.get_metrics().record_call(
+                endpoint=pm.get_endpoint(url),
+                seconds=time.perf_counter() - start,
+                size=size,
+                status=status,
+            )
+
+    def close(self):
+        # tweepy closes its session after every call; keep connections alive
+        pass
+
+
+class ThreadLocalAPI(tweepy.API):
+    """API client whose `last_response` is tracked per thread
+
+    Concurrent exports share one client; each thread must read the rate limit
+    headers of its own responses, not those of whichever call finished last.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.local = threading.local()
+        super().__init__(*args, **kwargs)
+
+    @property
+    def last_response(self):
+        return getattr(self.local, "response", None)
+
+    @last_response.setter
+    def last_response(self, response):
+        self.local.response = response
+
+
+def with_globals(func: types.FunctionType, **overrides) -> types.FunctionType:
+    """Copy of a function that resolves some of its global names to other objects"""
+    copy = types.FunctionType(
+        func.__code__,
+        {**func.__globals__, **overrides},
+        func.__name__,
+        func.__defaults__,
+        func.__closure__,
+    )
+    copy.__kwdefaults__ = func.__kwdefaults__
+    # e.g., the `pagination_mode` of methods decorated by tweepy
+    copy.__dict__.update(func.__dict__)
+    return copy
+
+
+# tweepy binds a fresh session to every API method it builds; this binder builds
+# them with pooled sessions without touching the `tweepy.binder` module itself
+bind_pooled_api = with_globals(
+    tweepy.binder.bind_api, requests=SimpleNamespace(Session=PooledSession)
+)
+
+
+def bind_pooled_methods(cls: type) -> type:
+    """Rebuild the API methods of a tweepy.API subclass with the pooled binder"""
+    for name, member in vars(tweepy.API).items():
+        if name.startswith("__"):
+            continue
+        if isinstance(member, property):
+            fget = with_globals(member.fget, bind_api=bind_pooled_api)
+            setattr(cls, name, property(fget, doc=member.__doc__))
+        elif isinstance(member, types.FunctionType):
+            setattr(cls, name, with_globals(member, bind_api=bind_pooled_api))
+    return cls
+
+
+@bind_pooled_methods
+class PooledAPI(ThreadLocalAPI):
+    """API client whose methods send their calls through the pooled adapter
+
+    Only this client's methods are rebound, so other tweepy clients in the
+    process keep their own sessions.
+    """
+
+
+@functools.lru_cache(maxsize=None)
+def get_http_adapter() -> HTTPAdapter:
+    return HTTPAdapter(
+        pool_connections=settings.pool_connections,
+        pool_maxsize=settings.pool_maxsize,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_api() -> tweepy.API:
+    auth = tweepy.OAuthHandler(settings.CONSUMER_KEY, settings.CONSUMER_SECRET)
+    auth.set_access_token(settings.ACCESS_TOKEN, settings.ACCESS_TOKEN_SECRET)
+    api = PooledAPI(auth, timeout=settings.api_timeout)
+
+    return api
@@ -1,9 +1,65 @@
+import functools
+import logging
+import logging.config
+import threading
 from pathlib import Path
 
-from dynaconf import Dynaconf
-
 user_config_path = Path.home() / ".plumes.toml"
 package_config_path = Path(__file__).parent / "settings.toml"
-settings = Dynaconf(
-    envvar_prefix="PLUMES", settings_files=[user_config_path, package_config_path]
-)
+
+LOGGER = logging.getLogger("plumes")
+LOGGING_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def get_settings():
+    # dynaconf is slow to import; only pay for it once settings are used
+    from dynaconf import Dynaconf
+
+    return Dynaconf(
+        envvar_prefix="PLUMES", settings_files=[user_config_path, package_config_path]
+    )
+
+
+class LazySettings:
+    """Proxy to the plumes settings, loaded on first use"""
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value):
+        setattr(get_settings(), name, value)
+
+    def __delattr__(self, name: str):
+        delattr(get_settings(), name)
+
+
+settings = LazySettings()
+
+
+class DeferredConfig(logging.Filter):
+    """One-shot filter configuring logging from the settings on first use
+
+    As a filter of the `plumes` logger, it runs before the first record is
+    handed to any handler, so that record goes out once, through the
+    configured handlers.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        configure_logging()
+        return True
+
+
+def configure_logging():
+    """Replace the placeholder filter with the configured handlers, once"""
+    with LOGGING_LOCK:
+        placeholders = [f for f in LOGGER.filters if isinstance(f, DeferredConfig)]
+        if placeholders:
+            logging.config.dictConfig(settings.logging)
+            for f in placeholders:
+                LOGGER.removeFilter(f)
+
+
+if not LOGGER.filters and not LOGGER.handlers:
+    LOGGER.setLevel(logging.DEBUG)
+    LOGGER.addFilter(DeferredConfig())
@@ -0,0 +1,345 @@
+import contextlib
+import hmac
+import io
+import json
+import logging
+import os
+import secrets
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+import plumes.cache as pcache
+import plumes.metrics as pm
+
+LOGGER = logging.getLogger("plumes")
+
+# seconds between checks for due jobs, unless woken up earlier
+POLL_INTERVAL = 1
+
+# commands that can be run over HTTP: exports and lookups, never ones that act
+# on the account (e.g., `audit_users --prune` or `run_plan`) or expose secrets
+HTTP_COMMANDS = [
+    "friends",
+    "followers",
+    "favorites",
+    "tweets",
+    "batch",
+    "sync",
+    "diff",
+    "index",
+    "view_user",
+    "view_tweet",
+]
+
+# browsers send the page's host; only accept requests addressed to this machine
+LOCAL_HOSTS = ["127.0.0.1", "localhost", "[::1]"]
+
+
+class ThreadStdout(io.TextIOBase):
+    """Stand-in for sys.stdout sending each capturing thread's output to its stream
+
+    Threads that aren't capturing (e.g., scheduled jobs) write to the real
+    stdout, so concurrent commands never mix their output.
+    """
+
+    def __init__(self, stdout: TextIO):
+        self.stdout = stdout
+        self.local = threading.local()
+        self.captures = 0
+
+    @property
+    def stream(self) -> TextIO:
+        stream = getattr(self.local, "stream", None)
+        return self.stdout if stream is None else stream
+
+    def write(self, s: str) -> int:
+        return self.stream.write(s)
+
+    def flush(self):
+        self.stream.flush()
+
+
+# guards installing and removing the stand-in stdout
+STDOUT_LOCK = threading.Lock()
+
+
+@contextlib.contextmanager
+def capture_stdout(stream: TextIO) -> Iterator[TextIO]:
+    """Capture what the current thread prints, and only that, into a stream"""
+    with STDOUT_LOCK:
+        if not isinstance(sys.stdout, ThreadStdout):
+            sys.stdout = ThreadStdout(sys.stdout)
+        stdout = sys.stdout
+        stdout.captures += 1
+    previous = getattr(stdout.local, "stream", None)
+    stdout.local.stream = stream
+    try:
+        yield stream
+    finally:
+        stdout.local.stream = previous
+        with STDOUT_LOCK:
+            stdout.captures -= 1
+            # restore the real stdout once no thread is capturing
+            if not stdout.captures and sys.stdout is stdout:
+                sys.stdout = stdout.stdout
+
+
+class Job:
+    """Command run every `every` seconds with the same arguments"""
+
+    def __init__(
+        self, name: str, command: str, every: float, args: Optional[dict] = None
+    ):
+        self.name = name
+        self.command = command
+        self.every = every
+        self.args = args or {}
+
+        # jobs first run as soon as the daemon starts
+        self.next_run = 0.0
+        self.last_run: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.runs = 0
+        self.failures = 0
+
+    def status(self) -> dict:
+        return {
+            "command": self.command,
+            "every": self.every,
+            "args": self.args,
+            "next_run": self.next_run,
+            "last_run": self.last_run,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+            "runs": self.runs,
+            "failures": self.failures,
+        }
+
+
+def load_jobs(config: List[dict], commands: Dict[str, Callable]) -> List[Job]:
+    """Jobs from the `daemon_jobs` settings, failing fast on unknown commands"""
+    jobs = []
+    for c in config:
+        c = dict(c)
+        name = c.get("name", c["command"])
+        if c["command"] not in commands:
+            raise ValueError(f"Unknown command {c['command']!r} for job {name!r}")
+        if name in [j.name for j in jobs]:
+            raise ValueError(f"Duplicate job {name!r}; give each job a unique name")
+        jobs.append(
+            Job(
+                name=name,
+                command=c["command"],
+                every=float(c["every"]),
+                args=dict(c.get("args", {})),
+            )
+        )
+    return jobs
+
+
+class Daemon:
+    """Scheduler of jobs and runner of ad-hoc commands in one warm process
+
+    Commands run in-process, so the authenticated client, the rate limiter's
+    budgets and the user cache are set up once and shared. Jobs run one at a
+    time on the scheduler's thread; ad-hoc commands run on their request's
+    thread and are paced by the same rate limiter.
+    """
+
+    def __init__(
+        self,
+        commands: Dict[str, Callable],
+        jobs: List[Job],
+        http_commands: Optional[List[str]] = None,
+    ):
+        self.commands = commands
+        self.http_commands = HTTP_COMMANDS if http_commands is None else http_commands
+        self.jobs = {j.name: j for j in jobs}
+        self.started_at = time.time()
+        self.stopped = threading.Event()
+        self.wakeup = threading.Event()
+
+    def run_job(self, job: Job):
+        LOGGER.info(f"Running job {job.name}")
+        start = time.time()
+        try:
+            self.commands[job.command](**job.args)
+            job.last_error = None
+        except Exception as e:
+            LOGGER.exception(f"Job {job.name} failed")
+            job.last_error = str(e)
+            job.failures += 1
+        finally:
+            job.runs += 1
+            job.last_run = start
+            job.last_duration = time.time() - start
+            job.next_run = max(start + job.every, time.time())
+
+            # keep the metrics files current between jobs
+            pm.get_metrics().emit()
+
+    def run_pending(self, now: Optional[float] = None) -> List[str]:
+        """Run the jobs that are due, returning their names"""
+        now = time.time() if now is None else now
+        due = [j for j in self.jobs.values() if j.next_run <= now]
+        for job in due:
+            if self.stopped.is_set():
+                break
+            self.run_job(job)
+        return [j.name for j in due]
+
+    def trigger(self, name: str):
+        """Run a job on the scheduler's next check"""
+        self.jobs[name].next_run = 0
+        self.wakeup.set()
+
+    def run_forever(self):
+        while not self.stopped.is_set():
+            self.run_pending()
+
+            # the cache only purges itself once per process; this one lives on
+            pcache.get_user_cache().purge()
+            self.wakeup.wait(POLL_INTERVAL)
+            self.wakeup.clear()
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+
+    def run_command(self, name: str, args: dict) -> Tuple[int, dict]:
+        """Run an ad-hoc command, returning an HTTP status and its output"""
+        if name not in self.commands or name not in self.http_commands:
+            return 404, {"error": f"Unknown command {name!r}"}
+
+        LOGGER.info(f"Running command {name}")
+        output = io.StringIO()
+        try:
+            with capture_stdout(output):
+                self.commands[name](**args)
+        except TypeError as e:
+            # e.g., unknown or missing arguments
+            return 400, {"error": str(e), "output": output.getvalue()}
+        except Exception as e:
+            LOGGER.exception(f"Command {name} failed")
+            return 500, {"error": str(e), "output": output.getvalue()}
+        return 200, {"output": output.getvalue()}
+
+    def status(self) -> dict:
+        return {
+            "uptime": time.time() - self.started_at,
+            "jobs": {name: j.status() for name, j in self.jobs.items()},
+            "commands": sorted(c for c in self.http_commands if c in self.commands),
+            "metrics": pm.get_metrics().summary(),
+        }
+
+    def handle(self, method: str, path: str, body: dict) -> Tuple[int, dict]:
+        """Route a request (e.g., `POST /commands/view_user`)"""
+        parts = path.strip("/").split("/")
+        if method == "GET" and parts == ["status"]:
+            return 200, self.status()
+        if method == "POST" and len(parts) == 2 and parts[0] == "commands":
+            return self.run_command(parts[1], body)
+        if method == "POST" and len(parts) == 2 and parts[0] == "jobs":
+            if parts[1] not in self.jobs:
+                return 404, {"error": f"Unknown job {parts[1]!r}"}
+            self.trigger(parts[1])
+            return 202, {"triggered": parts[1]}
+        return 404, {"error": f"No route for {method} {path}"}
+
+
+def write_token(path: Path) -> str:
+    """Write a new bearer token readable only by its owner (i.e., mode 0600)"""
+    token = secrets.token_urlsafe(32)
+    path = Path(path).expanduser()
+    fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    # the mode of os.open only applies to new files
+    os.chmod(str(path), 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    return token
+
+
+def is_local_host(host: str) -> bool:
+    """Whether a Host header names this machine (i.e., not a rebound domain)"""
+    host = host.strip().lower()
+    if host.startswith("["):
+        host = host.split("]", 1)[0] + "]"
+    else:
+        host = host.split(":", 1)[0]
+    return host in LOCAL_HOSTS
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.respond("GET")
+
+    def do_POST(self):
+        self.respond("POST")
+
+    def check_request(self, method: str) -> Optional[Tuple[int, dict]]:
+        """Error response of a request that isn't from a local, authorized client
+
+        Checking the Host header defeats DNS rebinding; requiring JSON bodies
+        defeats cross-site form posts, which browsers can't send as JSON
+        without a preflight this server never answers.
+        """
+        if not is_local_host(self.headers.get("Host", "")):
+            return 403, {"error": "Requests must be addressed to localhost"}
+
+        expected = f"Bearer {self.server.token}"
+        given = self.headers.get("Authorization", "")
+        if not hmac.compare_digest(given.encode(), expected.encode()):
+            return 401, {"error": "Missing or invalid bearer token"}
+
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+        if method == "POST" and content_type != "application/json":
+            return 415, {"error": "Request bodies must be application/json"}
+        return None
+
+    def respond(self, method: str):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        error = self.check_request(method)
+        if error is not None:
+            status, payload = error
+        else:
+            try:
+                args = json.loads(body) if body else {}
+            except json.JSONDecodeError as e:
+                status, payload = 400, {"error": f"Invalid JSON body: {e}"}
+            else:
+                if isinstance(args, dict):
+                    status, payload = self.server.daemon.handle(method, self.path, args)
+                else:
+                    status, payload = 400, {"error": "Body must be a JSON object"}
+
+        data = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        LOGGER.debug(f"{self.address_string()} - {format % args}")
+
+
+class DaemonServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], daemon: Daemon, token: str):
+        self.daemon = daemon
+        self.token = token
+        super().__init__(address, RequestHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
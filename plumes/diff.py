@@ -0,0 +1,146 @@
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import plumes.audit as pau
+import plumes.utilities as pu
+
+LOGGER = logging.getLogger("plumes")
+CHANGES = ["added", "removed", "changed"]
+
+
+def get_count_fields(path: Path) -> List[str]:
+    """Count fields to compare, based on whether the export holds users or tweets"""
+    for record in pu.iter_records(path):
+        return pau.USER_COUNTS if "followers_count" in record else pau.TWEET_COUNTS
+    return []
+
+
+def load_counts(path: Path, fields: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Stream an export into sorted IDs and their matching rows of counts"""
+    ids = []
+    counts = []
+    for r in pu.iter_records(path):
+        ids.append(r["id"])
+        counts.append([r[f] for f in fields])
+
+    counts = np.array(counts, dtype=np.int64).reshape(len(ids), len(fields))
+
+    # sort and drop any duplicated records
+    ids, index = np.unique(np.array(ids, dtype=np.int64), return_index=True)
+    return ids, counts[index]
+
+
+def diff_counts(
+    old: Tuple[np.ndarray, np.ndarray], new: Tuple[np.ndarray, np.ndarray]
+) -> Dict[str, np.ndarray]:
+    """Compare two sorted (ids, counts) snapshots
+
+    Returns:
+        Dict[str, np.ndarray]: IDs added, removed and whose counts changed.
+    """
+    old_ids, old_counts = old
+    new_ids, new_counts = new
+
+    common, old_index, new_index = np.intersect1d(
+        old_ids, new_ids, assume_unique=True, return_indices=True
+    )
+    changed = (old_counts[old_index] != new_counts[new_index]).any(axis=1)
+
+    return {
+        "added": np.setdiff1d(new_ids, old_ids, assume_unique=True),
+        "removed": np.setdiff1d(old_ids, new_ids, assume_unique=True),
+        "changed": common[changed],
+    }
+
+
+def project(record: dict) -> dict:
+    """Keep only the fields the audit commands read from an export"""
+    if "followers_count" in record:
+        keys = ["id", "id_str", "screen_name", *pau.USER_COUNTS]
+        projected = {k: record[k] for k in keys}
+        if "status" in record:
+            projected["status"] = {"created_at": record["status"]["created_at"]}
+        return projected
+
+    keys = ["id", "id_str", "text", "created_at", *pau.TWEET_COUNTS, "favorited"]
+    return {k: record[k] for k in keys}
+
+
+def write_changes(
+    old: Path,
+    new: Path,
+    output: Path,
+    changes: Dict[str, np.ndarray],
+    fields: List[str],
+    old_counts: Dict[int, list],
+):
+    """Write the change log as JSON Lines of projected records
+
+    Each line is a record shaped like an export (so audits can read the log) with
+    a `change` key, plus the `previous` values of any counts that changed.
+    """
+    added = set(changes["added"].tolist())
+    removed = set(changes["removed"].tolist())
+    changed = set(changes["changed"].tolist())
+
+    with open(output, "w") as f:
+        # added and changed records carry their latest values
+        for r in pu.iter_records(new):
+            change = None
+            if r["id"] in added:
+                added.discard(r["id"])
+                change = {"change": "added"}
+            elif r["id"] in changed:
+                changed.discard(r["id"])
+                previous = dict(zip(fields, old_counts[r["id"]]))
+                previous = {k: v for k, v in previous.items() if r[k] != v}
+                change = {"change": "changed", "previous": previous}
+
+            if change:
+                f.write(json.dumps({**project(r), **change}))
+                f.write("\n")
+
+        # removed records carry their last known values
+        for r in pu.iter_records(old):
+            if r["id"] in removed:
+                removed.discard(r["id"])
+                f.write(json.dumps({**project(r), "change": "removed"}))
+                f.write("\n")
+
+
+def diff_exports(
+    old: Path, new: Path, output: Path, only: Optional[List[str]] = None
+) -> Dict[str, int]:
+    """Diff two exports of the same kind into a change log
+
+    Returns:
+        Dict[str, int]: Number of records per change type.
+    """
+    fields = get_count_fields(new) or get_count_fields(old)
+    old_ids, old_counts = load_counts(old, fields)
+    new_ids, new_counts = load_counts(new, fields)
+    changes = diff_counts((old_ids, old_counts), (new_ids, new_counts))
+
+    # drop change types that weren't asked for
+    only = CHANGES if only is None else only
+    changes = {
+        k: v if k in only else np.array([], dtype=np.int64) for k, v in changes.items()
+    }
+
+    # previous counts are only needed for the (usually few) changed records
+    index = np.searchsorted(old_ids, changes["changed"])
+    previous = dict(zip(changes["changed"].tolist(), old_counts[index].tolist()))
+
+    write_changes(
+        old=old,
+        new=new,
+        output=output,
+        changes=changes,
+        fields=fields,
+        old_counts=previous,
+    )
+    return {k: len(v) for k, v in changes.items()}
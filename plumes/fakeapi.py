@@ -0,0 +1,254 @@
+import json
+import logging
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+LOGGER = logging.getLogger("plumes")
+API_ROOT = "/1.1"
+
+# requests per window of Twitter's rate limited endpoints
+RATE_LIMITS = {
+    "/account/verify_credentials": 75,
+    "/users/show/:id": 900,
+    "/users/lookup": 900,
+    "/friends/list": 15,
+    "/followers/list": 15,
+    "/friends/ids": 15,
+    "/followers/ids": 15,
+    "/statuses/user_timeline": 900,
+    "/statuses/show/:id": 900,
+    "/favorites/list": 75,
+    "/application/rate_limit_status": 180,
+}
+
+
+class FakeTwitter:
+    """In-memory stand-in for the Twitter v1.1 endpoints plumes uses
+
+    Every account has the given users as its friends and followers, and the
+    given tweets as its tweets and favorites. Rate limited endpoints keep
+    per-window budgets and answer like Twitter (i.e., `x-rate-limit-*` headers
+    and 429s with error code 88), and every `fail_every`-th request is
+    rejected with a 429 regardless of its budget.
+    """
+
+    def __init__(
+        self,
+        users: List[dict],
+        tweets: List[dict],
+        latency: float = 0,
+        page_size: Optional[int] = None,
+        window: float = 900,
+        limits: Optional[Dict[str, int]] = None,
+        fail_every: int = 0,
+    ):
+        self.users = users
+        self.tweets = sorted(tweets, key=lambda t: t["id"], reverse=True)
+        self.latency = latency
+        self.page_size = page_size
+        self.window = window
+        self.limits = {**RATE_LIMITS, **(limits or {})}
+        self.fail_every = fail_every
+
+        self.lock = threading.Lock()
+        self.budgets = {}
+        self.requests = []
+
+    def get_profile(self, screen_name: str) -> dict:
+        template = self.users[0] if self.users else {"id": 1, "id_str": "1"}
+        return {
+            **template,
+            "screen_name": screen_name,
+            "friends_count": len(self.users),
+            "followers_count": len(self.users),
+            "statuses_count": len(self.tweets),
+            "favourites_count": len(self.tweets),
+        }
+
+    def check_rate_limit(self, endpoint: str) -> Tuple[bool, dict]:
+        """Spend one call of the endpoint's budget, if it has one"""
+        with self.lock:
+            self.requests.append(endpoint)
+            injected = self.fail_every and len(self.requests) % self.fail_every == 0
+
+            if endpoint not in self.limits:
+                return not injected, {}
+
+            now = time.time()
+            budget = self.budgets.get(endpoint)
+            if budget is None or now >= budget["reset"]:
+                budget = {
+                    "remaining": self.limits[endpoint],
+                    "reset": now + self.window,
+                }
+                self.budgets[endpoint] = budget
+
+            allowed = budget["remaining"] > 0 and not injected
+            if allowed:
+                budget["remaining"] -= 1
+
+            headers = {
+                "x-rate-limit-limit": str(self.limits[endpoint]),
+                "x-rate-limit-remaining": str(budget["remaining"]),
+                "x-rate-limit-reset": str(int(budget["reset"])),
+            }
+            return allowed, headers
+
+    def page(self, records: List, params: dict, key: str) -> dict:
+        """Cursor-paginated response (e.g., friends/list)"""
+        count = int(params.get("count", 20 if key == "users" else 5000))
+        count = min(count, self.page_size or count)
+        start = max(int(params.get("cursor", -1)), 0)
+        end = start + count
+        return {
+            key: records[start:end],
+            "next_cursor": end if end < len(records) else 0,
+            "next_cursor_str": str(end if end < len(records) else 0),
+            "previous_cursor": 0,
+            "previous_cursor_str": "0",
+        }
+
+    def timeline(self, params: dict) -> List[dict]:
+        """ID-paginated response (e.g., statuses/user_timeline)"""
+        count = int(params.get("count", 20))
+        count = min(count, self.page_size or count)
+        since_id = int(params.get("since_id", 0))
+        max_id = int(params.get("max_id", 2**63))
+        tweets = (t for t in self.tweets if since_id < t["id"] <= max_id)
+        return [t for _, t in zip(range(count), tweets)]
+
+    def find_tweet(self, tweet_id: str) -> dict:
+        return next(
+            (t for t in self.tweets if t["id_str"] == tweet_id),
+            {"id": int(tweet_id), "id_str": tweet_id},
+        )
+
+    def find_user(self, params: dict) -> dict:
+        screen_name = params.get("screen_name", "").lower()
+        user_id = params.get("user_id", params.get("id"))
+        for u in self.users:
+            if screen_name == u["screen_name"].lower() or user_id == u["id_str"]:
+                return u
+        return self.get_profile(params.get("screen_name") or params.get("id", ""))
+
+    def handle(self, method: str, path: str, params: dict) -> Tuple[int, dict, object]:
+        """Route a request to its endpoint
+
+        Returns:
+            Tuple[int, dict, object]: Status code, headers and JSON payload.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+
+        if not path.startswith(API_ROOT) or not path.endswith(".json"):
+            return 404, {}, {"errors": [{"code": 34, "message": "Not found"}]}
+
+        # e.g., `/1.1/statuses/destroy/123.json` -> `/statuses/destroy/123`
+        resource = path.replace(API_ROOT, "", 1).rsplit(".", 1)[0]
+        endpoint = resource
+        if resource in ["/users/show", "/statuses/show"]:
+            endpoint = f"{resource}/:id"
+        elif resource.startswith("/statuses/destroy/"):
+            endpoint = "/statuses/destroy/:id"
+            params["id"] = resource.rsplit("/", 1)[1]
+
+        allowed, headers = self.check_rate_limit(endpoint)
+        if not allowed:
+            error = {"errors": [{"code": 88, "message": "Rate limit exceeded"}]}
+            return 429, headers, error
+
+        routes = {
+            ("GET", "/account/verify_credentials"): lambda: self.get_profile("me"),
+            ("GET", "/users/show/:id"): lambda: self.find_user(params),
+            ("POST", "/users/lookup"): lambda: self.lookup(params),
+            ("GET", "/users/lookup"): lambda: self.lookup(params),
+            ("GET", "/friends/list"): lambda: self.page(self.users, params, "users"),
+            ("GET", "/followers/list"): lambda: self.page(self.users, params, "users"),
+            ("GET", "/friends/ids"): lambda: self.page(self.ids(), params, "ids"),
+            ("GET", "/followers/ids"): lambda: self.page(self.ids(), params, "ids"),
+            ("GET", "/statuses/user_timeline"): lambda: self.timeline(params),
+            ("GET", "/favorites/list"): lambda: self.timeline(params),
+            ("GET", "/statuses/show/:id"): lambda: self.find_tweet(params["id"]),
+            ("POST", "/statuses/destroy/:id"): lambda: self.find_tweet(params["id"]),
+            ("POST", "/favorites/create"): lambda: self.find_tweet(params["id"]),
+            ("POST", "/favorites/destroy"): lambda: self.find_tweet(params["id"]),
+            ("POST", "/friendships/create"): lambda: self.find_user(params),
+            ("POST", "/friendships/destroy"): lambda: self.find_user(params),
+            ("GET", "/application/rate_limit_status"): self.rate_limit_status,
+        }
+        route = routes.get((method, endpoint))
+        if route is None:
+            return 404, headers, {"errors": [{"code": 34, "message": "Not found"}]}
+
+        return 200, headers, route()
+
+    def ids(self) -> List[int]:
+        return [u["id"] for u in self.users]
+
+    def lookup(self, params: dict) -> List[dict]:
+        ids = set(params.get("user_id", "").split(","))
+        return [u for u in self.users if u["id_str"] in ids]
+
+    def rate_limit_status(self) -> dict:
+        now = time.time()
+        resources = {}
+        with self.lock:
+            for endpoint, limit in self.limits.items():
+                budget = self.budgets.get(endpoint)
+                if budget is None or now >= budget["reset"]:
+                    budget = {"remaining": limit, "reset": now + self.window}
+                family = endpoint.split("/")[1]
+                resources.setdefault(family, {})[endpoint] = {
+                    "limit": limit,
+                    "remaining": budget["remaining"],
+                    "reset": int(budget["reset"]),
+                }
+        return {"resources": resources}
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.respond("GET")
+
+    def do_POST(self):
+        self.respond("POST")
+
+    def respond(self, method: str):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+
+        # tweepy may also send parameters as a form body
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            params.update(parse_qsl(self.rfile.read(length).decode()))
+
+        status, headers, payload = self.server.twitter.handle(method, url.path, params)
+        body = json.dumps(payload).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        LOGGER.debug(f"{self.address_string()} - {format % args}")
+
+
+class FakeTwitterServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], twitter: FakeTwitter):
+        self.twitter = twitter
+        super().__init__(address, RequestHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
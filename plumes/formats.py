@@ -0,0 +1,123 @@
+import csv
+import gzip
+import lzma
+from pathlib import Path
+from typing import IO, Iterable, Iterator, Optional, Tuple
+
+# output format: file extension
+FORMATS = {"json": ".json", "compact": ".json", "jsonl": ".jsonl", "csv": ".csv"}
+
+# compression: opener, applied on top of any format (e.g., `jsonl.gz`)
+COMPRESSIONS = {"gz": gzip.open, "xz": lzma.open}
+
+# fields audits use, with nested fields flattened (e.g., `status.created_at`)
+USER_CSV_FIELDS = [
+    "id",
+    "id_str",
+    "screen_name",
+    "followers_count",
+    "friends_count",
+    "statuses_count",
+    "favourites_count",
+    "status.created_at",
+]
+TWEET_CSV_FIELDS = [
+    "id",
+    "id_str",
+    "created_at",
+    "text",
+    "favorite_count",
+    "retweet_count",
+    "favorited",
+]
+
+# CSV values are all strings; anything not listed here stays one
+CSV_TYPES = {
+    "id": int,
+    "followers_count": int,
+    "friends_count": int,
+    "statuses_count": int,
+    "favourites_count": int,
+    "favorite_count": int,
+    "retweet_count": int,
+    "favorited": lambda v: v == "True",
+}
+
+
+def parse_format(format: str) -> Tuple[str, Optional[str]]:
+    """Split an output format into its base format and compression
+
+    e.g., `jsonl.gz` -> `("jsonl", "gz")` and `csv` -> `("csv", None)`
+    """
+    base, _, compression = format.partition(".")
+    if base not in FORMATS or (compression and compression not in COMPRESSIONS):
+        raise ValueError(
+            f"Unknown format {format!r}; expected one of {', '.join(FORMATS)}, "
+            f"optionally followed by .{' or .'.join(COMPRESSIONS)}"
+        )
+    return base, compression or None
+
+
+def get_extension(format: str) -> str:
+    """File extension of an output format (e.g., `compact.xz` -> `.json.xz`)"""
+    base, compression = parse_format(format)
+    return FORMATS[base] + (f".{compression}" if compression else "")
+
+
+def get_compression(path: Path) -> Optional[str]:
+    suffix = Path(path).suffix.lstrip(".")
+    return suffix if suffix in COMPRESSIONS else None
+
+
+def get_suffix(path: Path) -> str:
+    """Suffix of an export's format, ignoring compression (e.g., `.jsonl`)"""
+    path = Path(path)
+    if get_compression(path):
+        path = path.with_suffix("")
+    return path.suffix
+
+
+def open_export(path: Path, mode: str = "r") -> IO:
+    """Open an export as text, (de)compressing it based on its suffix"""
+    # the csv module handles line endings itself
+    newline = "" if get_suffix(path) == ".csv" else None
+    compression = get_compression(path)
+    if compression:
+        return COMPRESSIONS[compression](path, f"{mode}t", newline=newline)
+    return open(path, mode, newline=newline)
+
+
+def get_csv_value(record: dict, field: str):
+    value = record
+    for key in field.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def write_csv(records: Iterable[dict], f: IO):
+    """Write the audited fields of users or tweets as CSV"""
+    records = list(records)
+    is_users = bool(records) and "screen_name" in records[0]
+    fields = USER_CSV_FIELDS if is_users else TWEET_CSV_FIELDS
+
+    writer = csv.writer(f)
+    writer.writerow(fields)
+    for r in records:
+        writer.writerow(get_csv_value(r, field) for field in fields)
+
+
+def read_csv(f: IO) -> Iterator[dict]:
+    """Read CSV rows back into (partial) records the audits can load"""
+    for row in csv.DictReader(f):
+        record = {}
+        for field, value in row.items():
+            # e.g., users without a status
+            if value == "":
+                continue
+
+            *parents, key = field.split(".")
+            nested = record
+            for p in parents:
+                nested = nested.setdefault(p, {})
+            nested[key] = CSV_TYPES.get(key, str)(value)
+        yield record
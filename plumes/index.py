@@ -0,0 +1,184 @@
+import json
+import logging
+import mmap
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import plumes.formats as pf
+
+LOGGER = logging.getLogger("plumes")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS offsets (
+    key TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def get_index_path(path: Path) -> Path:
+    return Path(path).with_name(f"{Path(path).name}.idx")
+
+
+def get_keys(record: dict) -> List[str]:
+    """Keys a record can be looked up by (i.e., ID and, for users, screen name)"""
+    keys = [f"id:{record['id_str']}"]
+    if "screen_name" in record:
+        keys.append(f"screen_name:{record['screen_name'].lower()}")
+    return keys
+
+
+def get_lookup_keys(value: str) -> List[str]:
+    """Keys to try for a screen name or ID given by a user (e.g., `@jack` or `12`)"""
+    value = str(value).lstrip("@")
+    keys = [f"screen_name:{value.lower()}"]
+    if value.isdigit():
+        keys.insert(0, f"id:{value}")
+    return keys
+
+
+def get_fingerprint(path: Path) -> Dict[str, int]:
+    stat = Path(path).stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def check_indexable(path: Path):
+    # byte offsets only make sense in an uncompressed file of one record per line
+    if pf.get_suffix(path) != ".jsonl" or pf.get_compression(path):
+        raise ValueError(
+            f"Only uncompressed JSON Lines exports can be indexed, not {path}"
+        )
+
+
+def is_fresh(path: Path) -> bool:
+    """Whether the export has an index built from its current contents"""
+    index_path = get_index_path(path)
+    if not index_path.exists():
+        return False
+
+    conn = sqlite3.connect(str(index_path))
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+    return meta == get_fingerprint(path)
+
+
+def build_index(path: Path) -> Path:
+    """Write the sidecar index (`<export>.idx`) of every record's byte offset"""
+    path = Path(path)
+    check_indexable(path)
+    index_path = get_index_path(path)
+    LOGGER.info(f"Indexing {path.resolve()}")
+
+    # fingerprint first so a concurrent rewrite leaves the index stale
+    fingerprint = get_fingerprint(path)
+
+    # build beside the index then rename so readers never see half of one
+    tmp_path = index_path.with_name(f"{index_path.name}.tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    conn = sqlite3.connect(str(tmp_path))
+    try:
+        conn.executescript(SCHEMA)
+        with open(path, "rb") as f, conn:
+            offset = 0
+            rows = []
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    rows.extend((k, offset, len(line)) for k in get_keys(record))
+                offset += len(line)
+
+                if len(rows) >= 10000:
+                    # exports list the newest records first; keep those
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO offsets VALUES (?, ?, ?)", rows
+                    )
+                    rows = []
+
+            conn.executemany("INSERT OR IGNORE INTO offsets VALUES (?, ?, ?)", rows)
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", fingerprint.items())
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+class IndexedExport:
+    """Random access to the records of a JSON Lines export through its index
+
+    The export is memory-mapped, so a lookup only reads its record's bytes
+    whatever the size of the export. Missing or stale indexes are rebuilt.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        if not is_fresh(self.path):
+            build_index(self.path)
+
+        self.conn = sqlite3.connect(str(get_index_path(self.path)))
+        self.file = open(self.path, "rb")
+
+        # empty files can't be mapped
+        self.data = b""
+        if get_fingerprint(self.path)["size"]:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, offset: int, length: int) -> dict:
+        end = offset + length
+        return json.loads(self.data[offset:end])
+
+    def locate(self, key: str) -> Optional[Tuple[int, int]]:
+        """Byte offset and length of a key's record"""
+        return self.conn.execute(
+            "SELECT offset, length FROM offsets WHERE key = ?", (key,)
+        ).fetchone()
+
+    def get(self, key: str) -> Optional[dict]:
+        location = self.locate(key)
+        return None if location is None else self.read(*location)
+
+    def find(self, value: str) -> Optional[dict]:
+        """Record of a screen name or ID, if the export has it"""
+        for key in get_lookup_keys(value):
+            record = self.get(key)
+            if record is not None:
+                return record
+        return None
+
+    def find_many(self, values: Iterable[str]) -> List[dict]:
+        """Records of many screen names or IDs, without duplicates"""
+        records = {}
+        for value in values:
+            for key in get_lookup_keys(value):
+                location = self.locate(key)
+                if location is not None:
+                    if location not in records:
+                        records[location] = self.read(*location)
+                    break
+            else:
+                LOGGER.warning(f"{value} isn't in {self.path}")
+        return list(records.values())
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+        self.conn.close()
+
+    def __enter__(self) -> "IndexedExport":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,172 @@
+import contextlib
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from plumes.config import settings
+
+LOGGER = logging.getLogger("plumes")
+
+# upper bounds (in seconds) of the API latency histogram buckets
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf")]
+
+
+def get_endpoint(url: str) -> str:
+    """Endpoint of an API URL, as named by Twitter's rate limits
+
+    e.g., `https://api.twitter.com/1.1/statuses/destroy/123.json?x=1` ->
+    `/statuses/destroy/:id`
+    """
+    path = url.split("?", 1)[0].split("/1.1", 1)[-1]
+    path = re.sub(r"\.json$", "", path)
+    return re.sub(r"/\d+$", "/:id", path)
+
+
+class Metrics:
+    """Thread-safe counters of API calls, sleeps and command stages"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.endpoints: Dict[str, dict] = {}
+        self.sleeps: Dict[str, float] = {}
+        self.stages: Dict[str, dict] = {}
+
+    def record_call(self, endpoint: str, seconds: float, size: int, status: str):
+        with self.lock:
+            stats = self.endpoints.setdefault(
+                endpoint,
+                {
+                    "calls": 0,
+                    "statuses": {},
+                    "rate_limited": 0,
+                    "bytes": 0,
+                    "seconds": 0.0,
+                    "buckets": [0] * len(LATENCY_BUCKETS),
+                },
+            )
+            stats["calls"] += 1
+            stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+            stats["rate_limited"] += status == "429"
+            stats["bytes"] += size
+            stats["seconds"] += seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats["buckets"][i] += 1
+                    break
+
+    def record_sleep(self, reason: str, seconds: float):
+        with self.lock:
+            self.sleeps[reason] = self.sleeps.get(reason, 0) + seconds
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Time a stage of a command (e.g., load, audit or serialize)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                stats = self.stages.setdefault(name, {"runs": 0, "seconds": 0.0})
+                stats["runs"] += 1
+                stats["seconds"] += seconds
+
+    def summary(self) -> dict:
+        with self.lock:
+            return json.loads(
+                json.dumps(
+                    {
+                        "duration": time.time() - self.started_at,
+                        "endpoints": self.endpoints,
+                        "sleeps": self.sleeps,
+                        "stages": self.stages,
+                    }
+                )
+            )
+
+    def to_prometheus(self) -> str:
+        """Metrics in the Prometheus text format (e.g., for a textfile collector)"""
+        summary = self.summary()
+        lines = [
+            "# TYPE plumes_api_requests_total counter",
+            "# TYPE plumes_api_rate_limited_total counter",
+            "# TYPE plumes_api_response_bytes_total counter",
+            "# TYPE plumes_api_request_duration_seconds histogram",
+        ]
+        for endpoint, stats in sorted(summary["endpoints"].items()):
+            label = f'endpoint="{endpoint}"'
+            for status, count in sorted(stats["statuses"].items()):
+                lines.append(
+                    f'plumes_api_requests_total{{{label},status="{status}"}} {count}'
+                )
+            lines.append(
+                f"plumes_api_rate_limited_total{{{label}}} {stats['rate_limited']}"
+            )
+            lines.append(f"plumes_api_response_bytes_total{{{label}}} {stats['bytes']}")
+
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats["buckets"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else bound
+                lines.append(
+                    "plumes_api_request_duration_seconds_bucket"
+                    f'{{{label},le="{le}"}} {cumulative}'
+                )
+            lines.append(
+                f"plumes_api_request_duration_seconds_sum{{{label}}} {stats['seconds']}"
+            )
+            lines.append(
+                f"plumes_api_request_duration_seconds_count{{{label}}} {stats['calls']}"
+            )
+
+        lines.append("# TYPE plumes_sleep_seconds_total counter")
+        for reason, seconds in sorted(summary["sleeps"].items()):
+            lines.append(f'plumes_sleep_seconds_total{{reason="{reason}"}} {seconds}')
+
+        lines.append("# TYPE plumes_stage_duration_seconds_total counter")
+        for name, stats in sorted(summary["stages"].items()):
+            lines.append(
+                f'plumes_stage_duration_seconds_total{{stage="{name}"}} '
+                f"{stats['seconds']}"
+            )
+
+        lines.append("# TYPE plumes_last_run_timestamp_seconds gauge")
+        lines.append(f"plumes_last_run_timestamp_seconds {time.time()}")
+        return "\n".join(lines) + "\n"
+
+    def emit(self, path: Optional[str] = None, textfile: Optional[str] = None):
+        """Log the JSON summary and write it and/or a Prometheus textfile"""
+        # e.g., `--help` or `view_config`
+        if not (self.endpoints or self.sleeps or self.stages):
+            return
+
+        path = settings.metrics_path if path is None else path
+        textfile = settings.metrics_textfile if textfile is None else textfile
+
+        summary = json.dumps(self.summary(), sort_keys=True)
+        LOGGER.debug(f"Metrics: {summary}")
+        if path:
+            write_atomic(Path(path).expanduser(), summary)
+        if textfile:
+            write_atomic(Path(textfile).expanduser(), self.to_prometheus())
+
+
+def write_atomic(path: Path, text: str):
+    # scrapers must never read a half-written file
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+@functools.lru_cache(maxsize=None)
+def get_metrics() -> Metrics:
+    """Process-wide metrics shared by all commands"""
+    return Metrics()
@@ -0,0 +1,147 @@
+import functools
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+import plumes.metrics as pm
+from plumes.config import settings
+from plumes.lazy import lazy_import
+
+tweepy = lazy_import("tweepy")
+
+LOGGER = logging.getLogger("plumes")
+
+
+class RateLimiter:
+    """Track per-endpoint rate limit budgets and wait out exhausted windows.
+
+    Budgets are seeded from `api.rate_limit_status()` and kept current from the
+    `x-rate-limit-remaining` / `x-rate-limit-reset` headers of every response.
+    """
+
+    def __init__(self, buffer: Optional[float] = None):
+        self.buffer = settings.rate_limit_buffer if buffer is None else buffer
+        self.budgets: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self.is_primed = False
+
+    def prime(self, api: "tweepy.API"):
+        if self.is_primed:
+            return
+
+        try:
+            status = api.rate_limit_status()
+        except tweepy.error.TweepError as e:  # pragma: no cover
+            LOGGER.warning(f"Unable to fetch rate limit status: {e}")
+            return
+
+        with self.lock:
+            for resources in status["resources"].values():
+                for endpoint, budget in resources.items():
+                    self.budgets[endpoint] = {
+                        "remaining": budget["remaining"],
+                        "reset": budget["reset"],
+                    }
+        self.is_primed = True
+
+    def update(self, endpoint: str, headers):
+        remaining = headers.get("x-rate-limit-remaining")
+        reset = headers.get("x-rate-limit-reset")
+        if remaining is None or reset is None:
+            return
+
+        with self.lock:
+            self.budgets[endpoint] = {"remaining": int(remaining), "reset": int(reset)}
+
+    def record(self, endpoint: str, response):
+        headers = getattr(response, "headers", None)
+        if headers is not None:
+            self.update(endpoint, headers)
+
+    def get_delay(self, endpoint: str) -> float:
+        budget = self.budgets.get(endpoint)
+        if budget is None:
+            return 0
+
+        delay = budget["reset"] + self.buffer - time.time()
+        if delay <= 0:
+            # window has reset; wait for fresh headers
+            del self.budgets[endpoint]
+            return 0
+
+        return 0 if budget["remaining"] > 0 else delay
+
+    def acquire(self, endpoint: str):
+        """Block until the endpoint has budget left, then reserve one call"""
+        while True:
+            with self.lock:
+                delay = self.get_delay(endpoint)
+                if delay == 0:
+                    if endpoint in self.budgets:
+                        self.budgets[endpoint]["remaining"] -= 1
+                    return
+
+            LOGGER.info(
+                f"Rate limit for {endpoint} exhausted; sleeping for {delay:.0f}s"
+            )
+            pm.get_metrics().record_sleep("rate_limiter", delay)
+            time.sleep(delay)
+
+    def wrap(self, func, api: "tweepy.API", endpoint: str):
+        """Pace a tweepy API method (e.g., `api.followers`) against its budget"""
+
+        def call(*args, **kwargs):
+            # tweepy builds (but doesn't send) requests with `create=True`
+            if kwargs.get("create"):
+                return func(*args, **kwargs)
+
+            self.acquire(endpoint)
+            before = getattr(api, "last_response", None)
+            try:
+                result = func(*args, **kwargs)
+            except tweepy.error.TweepError as e:
+                # e.g., a 429's headers, but none for a call that never got a
+                # response (e.g., a timeout)
+                self.record(endpoint, e.response)
+                raise
+
+            # an unchanged last response belongs to an earlier call, possibly to
+            # another endpoint
+            response = getattr(api, "last_response", None)
+            if response is not before:
+                self.record(endpoint, response)
+            return result
+
+        # tweepy.Cursor relies on the method's pagination mode
+        if hasattr(func, "pagination_mode"):
+            call.pagination_mode = func.pagination_mode
+
+        return call
+
+
+def is_rate_limit_error(error: "tweepy.error.TweepError") -> bool:
+    # tweepy only raises RateLimitError when it parses the error payload, which
+    # it doesn't for raw pages (e.g., cursoring user timelines)
+    response = error.response
+    return isinstance(error, tweepy.RateLimitError) or (
+        response is not None and response.status_code == 429
+    )
+
+
+def get_reset_delay(response) -> float:
+    """Seconds until the rate limit window of a (429) response resets"""
+    reset = None
+    if response is not None:
+        reset = response.headers.get("x-rate-limit-reset")
+
+    if reset is None:
+        return settings.sleep_time
+
+    return max(int(reset) + settings.rate_limit_buffer - time.time(), 0)
+
+
+@functools.lru_cache(maxsize=None)
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide rate limiter shared by all commands"""
+    return RateLimiter()
@@ -0,0 +1,254 @@
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import plumes.audit as pau
+
+STORE_SUFFIXES = [".db", ".sqlite", ".sqlite3"]
+USER_KINDS = ["friends", "followers"]
+TWEET_KINDS = ["tweets", "favorites"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id_str TEXT PRIMARY KEY,
+    screen_name TEXT NOT NULL,
+    followers_count INTEGER NOT NULL,
+    friends_count INTEGER NOT NULL,
+    statuses_count INTEGER NOT NULL,
+    favourites_count INTEGER NOT NULL,
+    status_created_at TEXT,
+    last_status REAL NOT NULL,
+    json TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_screen_name ON users (screen_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS users_followers_count ON users (followers_count);
+CREATE INDEX IF NOT EXISTS users_friends_count ON users (friends_count);
+CREATE INDEX IF NOT EXISTS users_statuses_count ON users (statuses_count);
+CREATE INDEX IF NOT EXISTS users_favourites_count ON users (favourites_count);
+CREATE INDEX IF NOT EXISTS users_last_status ON users (last_status);
+
+CREATE TABLE IF NOT EXISTS tweets (
+    id_str TEXT PRIMARY KEY,
+    screen_name TEXT,
+    text TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    created_ts REAL NOT NULL,
+    favorite_count INTEGER NOT NULL,
+    retweet_count INTEGER NOT NULL,
+    favorited INTEGER NOT NULL,
+    json TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tweets_screen_name ON tweets (screen_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS tweets_created_ts ON tweets (created_ts);
+CREATE INDEX IF NOT EXISTS tweets_favorite_count ON tweets (favorite_count);
+CREATE INDEX IF NOT EXISTS tweets_retweet_count ON tweets (retweet_count);
+
+-- which users/tweets belong to an account's friends, followers, tweets or favorites
+CREATE TABLE IF NOT EXISTS collections (
+    source TEXT NOT NULL COLLATE NOCASE,
+    kind TEXT NOT NULL,
+    id_str TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (source, kind, id_str)
+);
+"""
+
+# columns that audit criteria can be pushed down to (and their audit field names)
+USER_COLUMNS = {
+    "followers_count": "followers_count",
+    "friends_count": "friends_count",
+    "statuses_count": "statuses_count",
+    "favourites_count": "favourites_count",
+    "last_status": "last_status",
+}
+TWEET_COLUMNS = {
+    "favorite_count": "favorite_count",
+    "retweet_count": "retweet_count",
+    "created_at": "created_ts",
+    "favorited": "favorited",
+}
+SQL_OPERATORS = {"<": "<", ">": ">", "==": "="}
+
+
+def is_store(path: Path) -> bool:
+    return Path(path).suffix in STORE_SUFFIXES
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def get_last_status(user: dict) -> float:
+    # users who never tweeted are infinitely old, as in the audit columns
+    created_at = user.get("status", {}).get("created_at")
+    return pau.parse_timestamps([created_at])[0] if created_at else float("-inf")
+
+
+def sync_records(
+    conn: sqlite3.Connection, records: Iterable[dict], source: str, kind: str
+) -> int:
+    """Upsert exported users or tweets (by `id_str`) into the store
+
+    Friends and followers exports are full snapshots, so users missing from
+    one (e.g., unfollowers) are removed from the account's collection. Tweets
+    and favorites exports may be incremental, so those collections only grow.
+
+    Returns:
+        int: Number of records synced.
+    """
+    now = time.time()
+    records = list(records)
+    with conn:
+        if kind in USER_KINDS:
+            conn.executemany(
+                "INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        u["id_str"],
+                        u["screen_name"],
+                        u["followers_count"],
+                        u["friends_count"],
+                        u["statuses_count"],
+                        u["favourites_count"],
+                        u.get("status", {}).get("created_at"),
+                        get_last_status(u),
+                        json.dumps(u),
+                        now,
+                    )
+                    for u in records
+                ),
+            )
+        elif kind in TWEET_KINDS:
+            conn.executemany(
+                "INSERT OR REPLACE INTO tweets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        t["id_str"],
+                        t.get("user", {}).get("screen_name"),
+                        t["text"],
+                        t["created_at"],
+                        pau.parse_timestamps([t["created_at"]])[0],
+                        t["favorite_count"],
+                        t["retweet_count"],
+                        t["favorited"],
+                        json.dumps(t),
+                        now,
+                    )
+                    for t in records
+                ),
+            )
+        else:
+            raise ValueError(f"Unknown kind {kind!r}")
+
+        conn.executemany(
+            "INSERT OR REPLACE INTO collections VALUES (?, ?, ?, ?)",
+            ((source, kind, r["id_str"], now) for r in records),
+        )
+        if kind in USER_KINDS:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS synced (id_str TEXT)")
+            conn.execute("DELETE FROM synced")
+            conn.executemany(
+                "INSERT INTO synced VALUES (?)", ((r["id_str"],) for r in records)
+            )
+            conn.execute(
+                "DELETE FROM collections WHERE source = ? AND kind = ? "
+                "AND id_str NOT IN (SELECT id_str FROM synced)",
+                (source, kind),
+            )
+
+    return len(records)
+
+
+def build_filters(
+    criteria: List[Tuple[str, str, object]], columns: dict
+) -> Tuple[List[str], list]:
+    """Translate audit criteria on indexed columns into SQL conditions"""
+    conditions = []
+    params = []
+    for field, op, value in criteria:
+        if field in columns:
+            conditions.append(f"{columns[field]} {SQL_OPERATORS[op]} ?")
+            params.append(value)
+    return conditions, params
+
+
+def query(
+    conn: sqlite3.Connection,
+    table: str,
+    select: str,
+    kind: str,
+    source: Optional[str],
+    conditions: List[str],
+    params: list,
+) -> List[sqlite3.Row]:
+    conditions = ["c.kind = ?"] + conditions
+    params = [kind] + params
+    if source is not None:
+        conditions.insert(0, "c.source = ?")
+        params.insert(0, source)
+
+    sql = (
+        f"SELECT DISTINCT {select} FROM {table} t "
+        "JOIN collections c ON c.id_str = t.id_str "
+        f"WHERE {' AND '.join(conditions)}"
+    )
+    return conn.execute(sql, params).fetchall()
+
+
+def query_users(
+    conn: sqlite3.Connection,
+    kind: str = "friends",
+    source: Optional[str] = None,
+    criteria: Optional[List[Tuple[str, str, object]]] = None,
+) -> List[pau.UserRecord]:
+    """Load the audit fields of a stored user collection
+
+    Criteria on indexed columns (e.g., `("followers_count", "<", 50)`) are pushed
+    down to SQL; callers must only pass criteria that every result has to meet.
+    """
+    conditions, params = build_filters(criteria or [], USER_COLUMNS)
+    rows = query(
+        conn,
+        table="users",
+        select=(
+            "t.id_str, t.screen_name, t.followers_count, t.friends_count, "
+            "t.statuses_count, t.favourites_count, t.status_created_at"
+        ),
+        kind=kind,
+        source=source,
+        conditions=conditions,
+        params=params,
+    )
+
+    return [pau.UserRecord(*r) for r in rows]
+
+
+def query_tweets(
+    conn: sqlite3.Connection,
+    kind: str = "tweets",
+    source: Optional[str] = None,
+    criteria: Optional[List[Tuple[str, str, object]]] = None,
+) -> List[pau.TweetRecord]:
+    """Load the audit fields of a stored tweet collection (see `query_users`)"""
+    conditions, params = build_filters(criteria or [], TWEET_COLUMNS)
+    rows = query(
+        conn,
+        table="tweets",
+        select=(
+            "t.id_str, t.text, t.created_at, t.favorite_count, t.retweet_count, "
+            "t.favorited"
+        ),
+        kind=kind,
+        source=source,
+        conditions=conditions,
+        params=params,
+    )
+
+    return [pau.TweetRecord(*r[:-1], bool(r["favorited"])) for r in rows]
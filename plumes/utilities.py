@@ -1,45 +1,156 @@
+import contextlib
 import json
 import logging
+import os
+import queue
+import threading
 import time
 from pathlib import Path
-from typing import List, Optional
-
-import tweepy
-from tqdm import tqdm
+from typing import Iterator, List, Optional, TextIO
 
+import plumes.cache as pcache
+import plumes.formats as pf
+import plumes.metrics as pm
+import plumes.ratelimit as pr
 from plumes.config import settings
+from plumes.lazy import lazy_import
+
+# the archive reader imports this module back
+parch = lazy_import("plumes.archive")
+
+# the network stack is only loaded by commands that talk to Twitter
+pclient = lazy_import("plumes.client")
+tqdm = lazy_import("tqdm")
+tweepy = lazy_import("tweepy")
 
 LOGGER = logging.getLogger("plumes")
+RECORD_SEPARATORS = " \t\r\n,[]"
+
+# fields of every user the API returns, which projections (e.g., CSV) drop
+FULL_USER_FIELDS = ["id", "id_str", "screen_name", "name", "created_at", "description"]
 
 
 def rate_limit_handler(cursor):
     while True:
         try:
             yield cursor.next()
-        except tweepy.RateLimitError:  # pragma: no cover
-            LOGGER.info(f"Rate limit exceeded; sleeping for {settings.sleep_time}s")
-            time.sleep(settings.sleep_time)
+        except tweepy.TweepError as e:
+            if not pr.is_rate_limit_error(e):
+                raise
+            sleep_time = pr.get_reset_delay(e.response)
+            LOGGER.info(f"Rate limit exceeded; sleeping for {sleep_time:.0f}s")
+            pm.get_metrics().record_sleep("rate_limited", sleep_time)
+            time.sleep(sleep_time)
         except StopIteration:
             break
 
 
-def get_api():
-    auth = tweepy.OAuthHandler(settings.CONSUMER_KEY, settings.CONSUMER_SECRET)
-    auth.set_access_token(settings.ACCESS_TOKEN, settings.ACCESS_TOKEN_SECRET)
-    api = tweepy.API(auth)
+def iter_pages(pages, total: int) -> Iterator[tuple]:
+    """Pages (and the cursor state after each) until `total` records are fetched"""
+    fetched = 0
+    for page in rate_limit_handler(pages):
+        yield page, get_cursor_state(pages)
+        fetched += len(page)
+        if fetched >= total:
+            return
+
+
+class Prefetcher:
+    """Iterates on a background thread, up to `depth` items ahead of the consumer
+
+    e.g., page N+1 is requested while page N is being written. The bounded queue
+    caps memory, and errors raised by the iterator are re-raised on the
+    consumer's thread. Closing it stops the background thread.
+    """
 
-    return api
+    DONE = object()
+
+    def __init__(self, iterator: Iterator, depth: int):
+        self.iterator = iterator
+        self.items = queue.Queue(maxsize=depth)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.produce, daemon=True)
+
+    def put(self, item) -> bool:
+        # give up once the consumer has stopped reading
+        while not self.stopped.is_set():
+            try:
+                self.items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(self):
+        try:
+            for item in self.iterator:
+                if not self.put((item, None)):
+                    return
+        except BaseException as e:
+            self.put((self.DONE, e))
+            return
+        self.put((self.DONE, None))
+
+    def __iter__(self) -> Iterator:
+        self.thread.start()
+        try:
+            while True:
+                item, error = self.items.get()
+                if item is self.DONE:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        self.stopped.set()
+
+
+def prefetch(iterator: Iterator, depth: int) -> Iterator:
+    """Iterate `depth` items ahead on a background thread (or in lockstep if 0)"""
+    if depth <= 0:
+        return iterator
+    return Prefetcher(iterator, depth=depth)
+
+
+def get_api() -> "tweepy.API":
+    return pclient.get_api()
+
+
+def parse_list(values) -> List[str]:
+    """Values from a comma-separated string or a file with one value per line"""
+    # fire parses comma-separated values into tuples and numbers into ints
+    if isinstance(values, (list, tuple)):
+        return [str(v) for v in values]
+    if isinstance(values, str) and Path(values).is_file():
+        with open(values) as f:
+            return [line.strip() for line in f if line.strip()]
+    return str(values).split(",")
+
+
+# suffixes of output files (e.g., `friends.json` or `tweets.jsonl.gz`)
+OUTPUT_SUFFIXES = [*pf.FORMATS.values(), *(f".{c}" for c in pf.COMPRESSIONS)]
 
 
 def set_output(fname: str, path: Optional[str]):
+    """Output file: `path` itself if it names a file (e.g., `friends.json`),
+    else `fname` in the `path` folder (created if missing) or the current one
+
+    New paths only name a file if they end in one of `OUTPUT_SUFFIXES`, so
+    folders can have dots in their name (e.g., `exports.v2`).
+    """
     if path:
         path = Path(path)
 
-        if not path.exists():  # pragma: no cover
+        if not path.exists() and path.suffix not in OUTPUT_SUFFIXES:
             path.mkdir(parents=True, exist_ok=True)
 
         if path.is_dir():
-            path / fname
+            path = path / fname
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
 
     else:
         path = Path.cwd() / fname
@@ -50,35 +161,438 @@ def set_output(fname: str, path: Optional[str]):
 
 
 def get_tweepy_objects(
-    func, screen_name: str, output: Path, total: int, count: int = 200
+    func,
+    screen_name: str,
+    output: Path,
+    total: int,
+    count: int = 200,
+    jsonl: bool = False,
+    compact: bool = False,
+    resume: bool = False,
+    api: Optional["tweepy.API"] = None,
+    endpoint: Optional[str] = None,
+    incremental: bool = False,
+    since_id: Optional[int] = None,
+    progress: bool = True,
 ):
-    # get users
+    # only fetch what's newer than the existing export, then merge it in
+    if incremental and output.exists():
+        since_id = get_newest_id(output)
+        LOGGER.info(f"Fetching records newer than {since_id}")
+        new_output = output.with_name(f".new-{output.name}")
+        get_tweepy_objects(
+            func=func,
+            screen_name=screen_name,
+            output=new_output,
+            total=total,
+            count=count,
+            jsonl=jsonl,
+            compact=compact,
+            resume=resume,
+            api=api,
+            endpoint=endpoint,
+            since_id=since_id,
+            progress=progress,
+        )
+        merge_exports(new=new_output, old=output, compact=compact)
+        return
+
+    # pace requests against the endpoint's rate limit budget
+    if api is not None and endpoint is not None:
+        limiter = pr.get_rate_limiter()
+        limiter.prime(api)
+        func = limiter.wrap(func, api=api, endpoint=endpoint)
+
+    if jsonl:
+        stream_tweepy_objects(
+            func=func,
+            screen_name=screen_name,
+            output=output,
+            total=total,
+            count=count,
+            resume=resume,
+            since_id=since_id,
+            progress=progress,
+        )
+        return
+
+    # get users, fetching the next pages while this one is processed
     objs = []
-    with tqdm(total=total) as pbar:
-        for o in rate_limit_handler(
-            tweepy.Cursor(func, screen_name=screen_name, count=count).items(total)
-        ):
-            objs.append(o)
-            pbar.update(1)
+    pages = tweepy.Cursor(
+        func, screen_name=screen_name, count=count, since_id=since_id
+    ).pages()
+    with tqdm.tqdm(total=total, disable=not progress) as pbar, contextlib.closing(
+        prefetch(iter_pages(pages, total), depth=settings.prefetch_pages)
+    ) as fetched:
+        for page, _ in fetched:
+            page = page[: total - len(objs)]
+            objs.extend(page)
+            pbar.update(len(page))
 
     # dump output
-    tweepy_to_json(models=objs, path=output)
+    tweepy_to_json(models=objs, path=output, compact=compact)
+
+
+def stream_tweepy_objects(
+    func,
+    screen_name: str,
+    output: Path,
+    total: int,
+    count: int = 200,
+    resume: bool = False,
+    since_id: Optional[int] = None,
+    progress: bool = True,
+):
+    # compressed streams can't be truncated back to a checkpoint
+    checkpoint = pf.get_compression(output) is None
+    if resume and not checkpoint:
+        raise ValueError(f"Can't resume compressed export {output}")
+
+    # pick up from the last checkpoint, if any
+    state_path = get_checkpoint_path(output)
+    state = load_checkpoint(state_path) if resume and output.exists() else {}
+    if resume and not state:
+        LOGGER.warning("No checkpoint found; starting from the first page")
+    written = state.get("written", 0)
+
+    # write each page as JSON Lines as soon as it arrives
+    with pf.open_export(output, "r+" if state else "w") as f, tqdm.tqdm(
+        total=total, initial=written, disable=not progress
+    ) as pbar:
+        if state:
+            # drop anything written after the last checkpoint
+            LOGGER.info(f"Resuming after {written} records")
+            f.seek(state["offset"])
+            f.truncate()
+
+        pages = tweepy.Cursor(
+            func,
+            screen_name=screen_name,
+            count=count,
+            since_id=since_id,
+            **state.get("cursor", {}),
+        ).pages()
+
+        # fetch the next pages while this one is written
+        fetched = prefetch(
+            iter_pages(pages, total - written), depth=settings.prefetch_pages
+        )
+        with contextlib.closing(fetched):
+            for page, cursor_state in fetched:
+                records = page[: total - written]
+                tweepy_to_jsonl(models=records, f=f)
+                f.flush()
+                written += len(records)
+                pbar.update(len(records))
+
+                # only checkpoint whole pages so a resume never skips records
+                if checkpoint and len(records) == len(page):
+                    save_checkpoint(
+                        path=state_path,
+                        state={
+                            "cursor": cursor_state,
+                            "written": written,
+                            "offset": f.tell(),
+                        },
+                    )
+
+                if written >= total:
+                    break
+
+    # export finished; nothing left to resume
+    if state_path.exists():
+        state_path.unlink()
+
+
+def get_users_by_ids(
+    api: "tweepy.API",
+    ids_func,
+    screen_name: str,
+    output: Path,
+    total: int,
+    jsonl: bool = False,
+    compact: bool = False,
+    previous: Optional[Path] = None,
+    endpoint: Optional[str] = None,
+    resume: bool = False,
+    progress: bool = True,
+):
+    """Export users by paging IDs (5,000 per call) and hydrating them in batches
+
+    Users found in a `previous` export younger than `settings.hydration_max_age`
+    or in the user cache are reused as-is instead of being looked up again.
+    """
+    # there's no cursor to checkpoint; re-runs reuse the cache instead
+    if resume:
+        raise ValueError(
+            "ID-first exports can't be resumed; re-run them (hydrated users are "
+            "cached) or pass the interrupted export as `previous`"
+        )
+
+    limiter = pr.get_rate_limiter()
+    limiter.prime(api)
+    if endpoint is not None:
+        ids_func = limiter.wrap(ids_func, api=api, endpoint=endpoint)
+    lookup = limiter.wrap(api.lookup_users, api=api, endpoint="/users/lookup")
+
+    ids = get_ids(func=ids_func, screen_name=screen_name, total=total)
+    cached = load_fresh_users(previous) if previous is not None else {}
+    cached.update(load_cached_users([i for i in ids if i not in cached]))
+    LOGGER.info(f"Hydrating {len([i for i in ids if i not in cached])} users")
+
+    # hydrate in batches, keeping the ids' order
+    records = []
+    with pf.open_export(output, "w") as f, tqdm.tqdm(
+        total=len(ids), disable=not progress
+    ) as pbar:
+        pending = []
+        missing = []
+        for i, user_id in enumerate(ids):
+            pending.append(user_id)
+            if user_id not in cached:
+                missing.append(user_id)
+
+            if len(missing) == settings.lookup_batch_size or i == len(ids) - 1:
+                fetched = {}
+                if missing:
+                    users = lookup_users(lookup, missing)
+                    fetched = {u.id: u._json for u in users}
+                    pcache.get_user_cache().put(fetched.values())
+                batch = [
+                    cached.get(p) or fetched[p]
+                    for p in pending
+                    if p in cached or p in fetched
+                ]
+
+                if jsonl:
+                    for r in batch:
+                        f.write(json.dumps(r))
+                        f.write("\n")
+                    f.flush()
+                else:
+                    records.extend(batch)
+                pbar.update(len(pending))
+                pending = []
+                missing = []
+
+        if not jsonl:
+            write_records(records=records, f=f, path=output, compact=compact)
+
+
+def get_ids(func, screen_name: str, total: int) -> List[int]:
+    ids = []
+    pages = tweepy.Cursor(func, screen_name=screen_name).pages()
+    for page in rate_limit_handler(pages):
+        ids.extend(page)
+        if len(ids) >= total:
+            break
 
+    LOGGER.info(f"Fetched {min(len(ids), total)} ids")
+    return ids[:total]
 
-def tweepy_to_json(models: List, path: Path):
-    models = [m._json for m in models]
-    with open(path, "w") as f:
-        json.dump(models, f, indent=4)
 
+def lookup_users(lookup, user_ids: List[int]) -> list:
+    """Hydrate a batch of IDs; those that no longer resolve are left out"""
+    try:
+        return call_with_rate_limit(lookup, user_ids=user_ids)
+    except tweepy.TweepError as e:
+        # users/lookup answers 404 (code 17) when none of the IDs resolve (e.g.,
+        # a batch of suspended accounts)
+        response = e.response
+        if getattr(e, "api_code", None) == 17 or (
+            response is not None and response.status_code == 404
+        ):
+            LOGGER.warning(f"None of {len(user_ids)} users could be looked up")
+            return []
+        raise
+
+
+def is_full_user(record: dict) -> bool:
+    # CSV exports and change logs only keep the audited fields
+    return all(k in record for k in FULL_USER_FIELDS) and "change" not in record
+
+
+def load_fresh_users(path: Path) -> dict:
+    if time.time() - path.stat().st_mtime > settings.hydration_max_age:
+        LOGGER.info(f"{path} is stale; hydrating every user")
+        return {}
+
+    users = {u["id"]: u for u in load_records(path) if is_full_user(u)}
+    if not users:
+        LOGGER.warning(f"{path} has no full user records; hydrating every user")
+    return users
+
+
+def load_cached_users(ids: List[int]) -> dict:
+    found = pcache.get_user_cache().get_many(f"id:{i}" for i in ids)
+    return {u["id"]: u for u in found.values()}
+
+
+def call_with_rate_limit(func, *args, **kwargs):
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except tweepy.TweepError as e:
+            if not pr.is_rate_limit_error(e):
+                raise
+            sleep_time = pr.get_reset_delay(e.response)
+            LOGGER.info(f"Rate limit exceeded; sleeping for {sleep_time:.0f}s")
+            pm.get_metrics().record_sleep("rate_limited", sleep_time)
+            time.sleep(sleep_time)
+
+
+def get_checkpoint_path(output: Path) -> Path:
+    return output.with_name(f"{output.name}.state.json")
+
+
+def get_cursor_state(iterator) -> dict:
+    if hasattr(iterator, "next_cursor"):
+        return {"cursor": iterator.next_cursor}
+    return {"max_id": iterator.max_id}
+
+
+def save_checkpoint(path: Path, state: dict):
+    # write then rename so a crash never leaves a half-written checkpoint
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def iter_records(path: Path, chunk_size: int = 2**16) -> Iterator[dict]:
+    """Stream records from a JSON array, JSON Lines, CSV or Twitter archive export"""
+    with pf.open_export(path) as f:
+        suffix = pf.get_suffix(path)
+        if suffix == ".csv":
+            yield from pf.read_csv(f)
+        elif suffix == ".js":
+            yield from parch.iter_archive_file(f, chunk_size=chunk_size)
+        else:
+            yield from iter_json(f, chunk_size=chunk_size)
+
+
+def iter_json(f: TextIO, chunk_size: int = 2**16) -> Iterator[dict]:
+    """Stream records from a JSON array or JSON Lines file one at a time"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    while True:
+        # skip array brackets, commas and whitespace between records
+        while pos < len(buffer) and buffer[pos] in RECORD_SEPARATORS:
+            pos += 1
 
-def get_user(screen_name: Optional[str] = None):
+        try:
+            record, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # record is incomplete; read more of the file
+            chunk = f.read(chunk_size)
+            if not chunk:
+                if buffer[pos:].strip():
+                    raise
+                return
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        yield record
+
+
+def get_newest_id(path: Path) -> Optional[int]:
+    return max((r["id"] for r in load_records(path)), default=None)
+
+
+def merge_exports(new: Path, old: Path, compact: bool = False):
+    """Merge newer records into an existing export, newest first"""
+    records = load_records(new)
+    ids = {r["id_str"] for r in records}
+    records += [r for r in load_records(old) if r["id_str"] not in ids]
+    LOGGER.info(f"Merged {len(ids)} new records into {old.resolve()}")
+
+    dump_records(records=records, path=old, compact=compact)
+    new.unlink()
+
+
+def write_records(records: List[dict], f: TextIO, path: Path, compact: bool = False):
+    """Write records in the format of the export at `path`"""
+    suffix = pf.get_suffix(path)
+    if suffix == ".jsonl":
+        for r in records:
+            f.write(json.dumps(r))
+            f.write("\n")
+    elif suffix == ".csv":
+        pf.write_csv(records=records, f=f)
+    elif compact:
+        json.dump(records, f, separators=(",", ":"))
+    else:
+        json.dump(records, f, indent=4)
+
+
+def dump_records(records: List[dict], path: Path, compact: bool = False):
+    with pm.get_metrics().stage("serialize"), pf.open_export(path, "w") as f:
+        write_records(records=records, f=f, path=path, compact=compact)
+
+
+def tweepy_to_json(models: List, path: Path, compact: bool = False):
+    dump_records(records=[m._json for m in models], path=path, compact=compact)
+
+
+def tweepy_to_jsonl(models: List, f: TextIO):
+    with pm.get_metrics().stage("serialize"):
+        for m in models:
+            f.write(json.dumps(m._json))
+            f.write("\n")
+
+
+def load_records(path: Path) -> List[dict]:
+    """Load an export written as a JSON array, JSON Lines or CSV, maybe compressed"""
+    with pf.open_export(path) as f:
+        suffix = pf.get_suffix(path)
+        if suffix == ".jsonl":
+            return [json.loads(line) for line in f if line.strip()]
+        if suffix == ".csv":
+            return list(pf.read_csv(f))
+        return json.load(f)
+
+
+def get_user(
+    screen_name: Optional[str] = None,
+    api: Optional["tweepy.API"] = None,
+    refresh: bool = False,
+):
+    """Look up a user (or the authenticated user), preferring the user cache"""
+    api = api or get_api()
+    cache = pcache.get_user_cache()
+    key = f"screen_name:{screen_name.lower()}" if screen_name else "me"
+    cached = None if refresh else cache.get(key)
+    if cached is not None:
+        return tweepy.models.User.parse(api, cached)
+
+    limiter = pr.get_rate_limiter()
     if screen_name:
-        user = get_api().get_user(screen_name)
+        func = limiter.wrap(api.get_user, api=api, endpoint="/users/show/:id")
+        user = call_with_rate_limit(func, screen_name)
     else:
-        user = get_api().me()
+        func = limiter.wrap(api.me, api=api, endpoint="/account/verify_credentials")
+        user = call_with_rate_limit(func)
+
+    cache.put([user._json], me=not screen_name)
     return user
 
 
+def get_tweet(tweet_id: str, api: Optional["tweepy.API"] = None):
+    api = api or get_api()
+    limiter = pr.get_rate_limiter()
+    func = limiter.wrap(api.get_status, api=api, endpoint="/statuses/show/:id")
+    return call_with_rate_limit(func, tweet_id)
+
+
 def calculate_like_retweet_ratio(likes: int, retweets: int) -> float:
     if likes == 0:
         ratio = 0
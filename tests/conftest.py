@@ -1,7 +1,12 @@
+import json
 from pathlib import Path
+from types import SimpleNamespace
 
 import pytest
 
+import plumes.actions as pa
+import plumes.cache as pcache
+
 RESOURCES_DIR = Path(__file__).parent / "resources"
 
 
@@ -13,3 +18,35 @@ def users_path():
 @pytest.fixture
 def tweets_path():
     return RESOURCES_DIR / "test-tweets.json"
+
+
+@pytest.fixture
+def paged_users(users_path):
+    """Offline stand-in for a cursor-paginated tweepy method (e.g., api.friends)"""
+    with open(users_path) as f:
+        users = [SimpleNamespace(_json=u) for u in json.load(f)]
+
+    def func(cursor=-1, count=20, **kwargs):
+        start = 0 if cursor == -1 else cursor
+        end = start + count
+        next_cursor = end if end < len(users) else 0
+        return users[start:end], (start, next_cursor)
+
+    func.pagination_mode = "cursor"
+    return func
+
+
+@pytest.fixture(autouse=True)
+def user_cache(tmp_path_factory, monkeypatch):
+    """Give each test its own empty user cache"""
+    cache = pcache.UserCache(tmp_path_factory.mktemp("cache") / "cache.db")
+    monkeypatch.setattr(pcache, "get_user_cache", lambda: cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def journal(tmp_path_factory, monkeypatch):
+    """Give each test its own empty action journal"""
+    journal = pa.Journal(tmp_path_factory.mktemp("journal") / "journal.jsonl")
+    monkeypatch.setattr(pa, "get_journal", lambda: journal)
+    return journal
@@ -0,0 +1,124 @@
+from types import SimpleNamespace
+
+import pytest
+import tweepy
+
+import plumes.actions as pa
+
+
+def test_run_actions(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(pa.time, "sleep", sleeps.append)
+    attempts = {}
+
+    def destroy_status(target):
+        attempts[target] = attempts.get(target, 0) + 1
+        if target == "missing":
+            raise tweepy.error.TweepError("Not found", SimpleNamespace(status_code=404))
+        if target == "flaky" and attempts[target] == 1:
+            raise tweepy.error.TweepError(
+                "Over capacity", SimpleNamespace(status_code=503)
+            )
+        return target
+
+    summary = pa.run_actions(
+        func=destroy_status,
+        targets=["1", "2", "flaky", "missing"],
+        api=SimpleNamespace(),
+        endpoint="/statuses/destroy/:id",
+        description="Deleting",
+        workers=2,
+        retries=2,
+    )
+
+    assert sorted(summary["succeeded"]) == ["1", "2", "flaky"]
+    assert list(summary["failed"]) == ["missing"]
+
+    # transient errors are retried with backoff, permanent ones are not
+    assert attempts["flaky"] == 2
+    assert attempts["missing"] == 1
+    assert sleeps == [pa.settings.action_backoff]
+
+
+def test_journal(journal):
+    calls = []
+
+    def destroy_status(target):
+        calls.append(target)
+        if target == "deleted":
+            raise tweepy.error.TweepError("No status found", api_code=144)
+        if target == "protected":
+            raise tweepy.error.TweepError("Forbidden", SimpleNamespace(status_code=403))
+        return target
+
+    def run():
+        return pa.run_actions(
+            func=destroy_status,
+            targets=["1", "deleted", "protected"],
+            api=SimpleNamespace(),
+            endpoint="/statuses/destroy/:id",
+            description="Deleting",
+            action="delete",
+            journal=journal,
+        )
+
+    summary = run()
+    assert sorted(summary["succeeded"]) == ["1", "deleted"]
+    assert list(summary["failed"]) == ["protected"]
+    assert journal.get_done("delete") == {"1", "deleted"}
+    assert journal.get_done("favorite") == set()
+
+    # a re-run only retries what failed, even after a torn last line
+    with open(journal.path, "a") as f:
+        f.write('{"action": "delete", "tar')
+    calls.clear()
+    summary = run()
+    assert calls == ["protected"]
+    assert sorted(summary["skipped"]) == ["1", "deleted"]
+
+
+def test_journal_inverses_and_accounts(journal):
+    journal.record("follow", "1", "succeeded", account="me")
+    journal.record("follow", "2", "succeeded", account="me")
+    journal.record("unfollow", "2", "succeeded", account="me")
+    journal.record("unfollow", "3", "succeeded", account="me")
+    journal.record("follow", "3", "failed", account="me")
+
+    # a follow after an unfollow of the same user isn't done yet
+    assert journal.get_done("follow", account="me") == {"1"}
+    assert journal.get_done("unfollow", account="me") == {"2", "3"}
+
+    # other accounts sharing the journal do their own actions
+    assert journal.get_done("follow", account="other") == set()
+    assert journal.get_done("follow") == set()
+
+
+def test_plan(tmp_path, monkeypatch, journal):
+    monkeypatch.setattr(pa.pu, "get_user", lambda api: SimpleNamespace(id_str="me"))
+    deleted = []
+    unfollowed = []
+    api = SimpleNamespace(
+        destroy_status=lambda id: deleted.append(id),
+        destroy_friendship=lambda user_id: unfollowed.append(user_id),
+    )
+
+    path = tmp_path / "plan.jsonl"
+    pa.write_plan(
+        {"delete": ["1", "2", 3], "unfollow": ["12"]}, path, labels={"12": "jack"}
+    )
+    assert '"label": "jack"' in path.read_text()
+    plan = pa.load_plan(path)
+    assert plan == {"delete": ["1", "2", "3"], "unfollow": ["12"]}
+
+    journal.record("delete", "2", "succeeded", account="me")
+    journal.record("delete", "3", "succeeded", account="other")
+    summaries = pa.execute_plan(plan, api=api, workers=1)
+    assert deleted == ["1", "3"]
+    assert summaries["delete"]["skipped"] == ["2"]
+
+    # users are targeted by ID, as screen names can change
+    assert unfollowed == ["12"]
+    assert journal.get_done("unfollow", account="me") == {"12"}
+
+    with pytest.raises(ValueError):
+        pa.execute_plan({"retweet": ["1"]}, api=api)
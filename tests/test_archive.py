@@ -0,0 +1,114 @@
+import json
+import zipfile
+
+import pytest
+
+import plumes.archive as parch
+import plumes.audit as pau
+import plumes.cli as pc
+import plumes.utilities as pu
+
+
+def to_archived(tweet: dict) -> dict:
+    # archives store numbers as strings and only have the full text
+    tweet = dict(tweet)
+    tweet["full_text"] = tweet.pop("text")
+    for k in ["id", "favorite_count", "retweet_count"]:
+        tweet[k] = str(tweet[k])
+    return {"tweet": tweet}
+
+
+def write_data_file(path, kind: str, part: int, records: list):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    records = json.dumps(records, indent=2)
+    path.write_text(f"window.YTD.{kind}.part{part} = {records}")
+
+
+@pytest.fixture
+def archive_dir(tmp_path, tweets_path):
+    tweets = pu.load_records(tweets_path)
+    half = len(tweets) // 2
+    data = tmp_path / "archive" / "data"
+    write_data_file(
+        data / "tweets.js", "tweets", 0, [to_archived(t) for t in tweets[:half]]
+    )
+    write_data_file(
+        data / "tweets-part1.js", "tweets", 1, [to_archived(t) for t in tweets[half:]]
+    )
+    likes = [{"like": {"tweetId": t["id_str"], "fullText": t["text"]}} for t in tweets]
+    write_data_file(data / "like.js", "like", 0, likes)
+    write_data_file(data / "tweet-headers.js", "tweet_headers", 0, [])
+    return data.parent
+
+
+def test_iter_archive(tmp_path, tweets_path, archive_dir):
+    tweets = pu.load_records(tweets_path)
+    expected = pau.load_tweets(tweets_path)
+
+    # a whole archive (extracted or not) is read part by part
+    zip_path = tmp_path / "archive.zip"
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        for path in archive_dir.rglob("*.js"):
+            archive.write(path, path.relative_to(archive_dir))
+
+    for path in [archive_dir, zip_path]:
+        assert pau.load_tweets(path) == expected
+        likes = pau.load_tweets(path, kind="favorites")
+        assert [t.id_str for t in likes] == [t["id_str"] for t in tweets]
+        assert all(t.favorited for t in likes)
+
+    # single data files read like any other export
+    assert (
+        pau.load_tweets(archive_dir / "data" / "tweets.js")
+        == expected[: len(tweets) // 2]
+    )
+
+    with pytest.raises(ValueError):
+        list(parch.iter_archive(archive_dir, kind="mentions"))
+
+
+def test_get_created_at(tweets_path):
+    for t in pu.load_records(tweets_path):
+        assert parch.get_created_at(t["id_str"]) == t["created_at"]
+    assert parch.get_created_at("20") is None
+
+    # likes of tweets older than Snowflake IDs are still dated, as their upper bound
+    like = parch.normalize_like(
+        {"like": {"tweetId": "20", "fullText": "just setting up"}}
+    )
+    assert like["created_at"] == "Thu Nov 04 01:42:54 +0000 2010"
+    cols = pau.get_tweet_columns([pau.TweetRecord.from_json(like)])
+    assert (cols["days_since_created"] > 365).all()
+
+
+def test_audit_archive(archive_dir):
+    pc.audit_tweets(path=str(archive_dir), days=30, self_favorited=False)
+    pc.audit_tweets(path=str(archive_dir), kind="favorites", days=365)
+
+
+def test_is_archive(tmp_path, archive_dir):
+    assert parch.is_archive(archive_dir)
+    assert parch.is_archive(archive_dir / "data")
+
+    # e.g., an archive without tweets or likes
+    manifest = tmp_path / "manifest" / "data" / "manifest.js"
+    write_data_file(manifest, "manifest", 0, {})
+    assert parch.is_archive(manifest.parent.parent)
+
+    # other folders and zips aren't archives, and aren't read as ones
+    folder = tmp_path / "exports"
+    folder.mkdir()
+    (folder / "jack-tweets.json").write_text("[]")
+    zip_path = tmp_path / "exports.zip"
+    with zipfile.ZipFile(zip_path, "w") as f:
+        f.write(folder / "jack-tweets.json", "jack-tweets.json")
+
+    for path in [folder, zip_path]:
+        assert not parch.is_archive(path)
+        with pytest.raises(ValueError, match="not a Twitter archive"):
+            pau.load_tweets(path)
+        with pytest.raises(ValueError, match="not a Twitter archive"):
+            pau.load_users(path)
+
+    with pytest.raises(ValueError, match="not users"):
+        pau.load_users(archive_dir)
@@ -0,0 +1,116 @@
+import json
+
+import numpy as np
+import pytest
+
+import plumes.audit as pau
+import plumes.utilities as pu
+
+
+def test_calculate_ratio():
+    numerators = np.array([0, 0, 5, 6])
+    denominators = np.array([0, 3, 0, 4])
+    expected = [
+        pu.calculate_tff_ratio(followers=n, friends=d)
+        for n, d in zip(numerators, denominators)
+    ]
+
+    assert list(pau.calculate_ratio(numerators, denominators)) == expected
+
+
+def test_parse_timestamps():
+    timestamps = pau.parse_timestamps(["Mon Sep 07 12:01:18 +0000 2020", None])
+
+    assert timestamps[0] == 1599480078
+    assert np.isnan(timestamps[1])
+
+
+def test_combine_clauses():
+    clauses = [np.array([True, True, False]), np.array([True, False, False])]
+
+    assert list(pau.combine_clauses(clauses, size=3, bool_or=False)) == [
+        True,
+        False,
+        False,
+    ]
+    assert list(pau.combine_clauses(clauses, size=3, bool_or=True)) == [
+        True,
+        True,
+        False,
+    ]
+    assert not pau.combine_clauses([], size=3, bool_or=False).any()
+
+
+def test_compile_where(users_path):
+    with open(users_path) as f:
+        users = json.load(f)
+    cols = pau.get_user_columns(pau.load_users(users_path))
+
+    predicate = pau.compile_where(
+        "followers_count < 50 and days_since_status > 365 or tff_ratio < 0.1",
+        fields=pau.USER_FIELDS,
+    )
+    expected = [
+        (u["followers_count"] < 50 and "status" not in u)
+        or pu.calculate_tff_ratio(u["followers_count"], u["friends_count"]) < 0.1
+        for u in users
+    ]
+    assert list(predicate(cols)) == expected
+
+    # derived fields are only built when referenced
+    assert "like_retweet_ratio" not in cols.cache
+    assert "last_status" in cols.cache
+
+    predicate = pau.compile_where(
+        "not 10 <= friends_count < 1000", fields=pau.USER_FIELDS
+    )
+    assert list(predicate(cols)) == [not 10 <= u["friends_count"] < 1000 for u in users]
+
+
+@pytest.mark.parametrize(
+    "expression, expected", [("True", True), ("not 1", False), ("1 > 2 or 0", False)]
+)
+def test_compile_where_constant(users_path, expression, expected):
+    users = pau.load_users(users_path)
+    cols = pau.get_user_columns(users)
+    mask = pau.compile_where(expression, fields=pau.USER_FIELDS)(cols)
+    assert mask.shape == (len(users),)
+    assert mask.dtype == bool and (mask == expected).all()
+
+    # e.g., identifying users as audit_users does
+    assert len(cols["screen_name"][mask]) == (len(users) if expected else 0)
+
+
+@pytest.mark.parametrize(
+    "expression", ["followers_count <", "foo > 1", "followers_count + 1 > 2"]
+)
+def test_compile_where_invalid(expression):
+    with pytest.raises(ValueError):
+        pau.compile_where(expression, fields=pau.USER_FIELDS)
+
+
+def test_load_users(tmp_path, users_path):
+    users = pu.load_records(users_path)
+    expected = [pau.UserRecord.from_json(u) for u in users]
+
+    # JSON arrays and JSON Lines stream to the same compact records
+    jsonl_path = tmp_path / "users.jsonl"
+    pu.dump_records(records=users, path=jsonl_path)
+    assert pau.load_users(users_path) == expected
+    assert pau.load_users(jsonl_path) == expected
+    assert not hasattr(expected[0], "__dict__")
+
+
+def test_relationship_fields(users_path):
+    users = pau.load_users(users_path)
+    friends = {u.id_str for u in users[:60]}
+    followers = {u.id_str for u in users[40:]}
+    cols = pau.get_user_columns(users, friends=friends, followers=followers)
+
+    predicate = pau.compile_where("not follows_back", fields=pau.USER_FIELDS)
+    assert predicate(cols).sum() == 40
+    assert cols["mutual"].sum() == 20
+    assert cols["fan"].sum() == 40
+
+    with pytest.raises(ValueError):
+        pau.get_user_columns(users)["following"]
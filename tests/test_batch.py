@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+import tweepy
+
+import plumes.batch as pb
+import plumes.utilities as pu
+
+
+def test_export_accounts(tmp_path, paged_users, users_path):
+    def get_user(screen_name):
+        if screen_name == "suspended":
+            raise tweepy.error.TweepError("User has been suspended")
+        user = {"id_str": screen_name, "screen_name": screen_name}
+        return SimpleNamespace(_json=user, screen_name=screen_name, friends_count=100)
+
+    api = SimpleNamespace(
+        friends=paged_users,
+        get_user=get_user,
+        rate_limit_status=lambda: {"resources": {}},
+        last_response=None,
+    )
+
+    summary = pb.export_accounts(
+        api=api,
+        screen_names=["alice", "bob", "carol", "suspended", "alice"],
+        kind="friends",
+        output=tmp_path,
+        limit=50,
+        workers=3,
+    )
+
+    assert sorted(summary["succeeded"]) == ["alice", "bob", "carol"]
+    assert list(summary["failed"]) == ["suspended"]
+
+    users = pu.load_records(users_path)
+    for screen_name, path in summary["succeeded"].items():
+        assert path == tmp_path / f"{screen_name}-friends.jsonl"
+        assert pu.load_records(path) == users[:50]
+
+    with pytest.raises(ValueError):
+        pb.export_accounts(api=api, screen_names=["alice"], kind="mentions")
+    with pytest.raises(ValueError):
+        pb.export_accounts(
+            api=api, screen_names=["alice"], kind="friends", format="yaml"
+        )
+
+
+def test_export_account_fresh_size(tmp_path, paged_users, user_cache):
+    # e.g., cached when hydrating another account's friends an hour ago
+    user_cache.put([{"id_str": "1", "screen_name": "alice", "friends_count": 10}])
+
+    def get_user(screen_name):
+        user = {"id_str": "1", "screen_name": screen_name, "friends_count": 50}
+        return SimpleNamespace(_json=user, screen_name=screen_name, friends_count=50)
+
+    api = SimpleNamespace(
+        friends=paged_users,
+        get_user=get_user,
+        rate_limit_status=lambda: {"resources": {}},
+        last_response=None,
+    )
+
+    path = pb.export_account(
+        api=api, screen_name="alice", kind="friends", output=tmp_path
+    )
+    assert len(pu.load_records(path)) == 50
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import plumes.cache as pcache
+import plumes.utilities as pu
+
+
+def test_user_cache(tmp_path, monkeypatch, users_path):
+    users = pu.load_records(users_path)[:3]
+    cache = pcache.UserCache(tmp_path / "cache.db", ttl=60, max_size=4)
+
+    now = [1000.0]
+    monkeypatch.setattr(pcache.time, "time", lambda: now[0])
+    cache.put(users[:1])
+
+    # users are found by ID or case-insensitive screen name
+    assert cache.get(f"id:{users[0]['id_str']}") == users[0]
+    key = f"screen_name:{users[0]['screen_name'].lower()}"
+    assert cache.get(key) == users[0]
+
+    # least recently read entries are evicted first
+    now[0] += 1
+    cache.put(users[1:2])
+    now[0] += 1
+    cache.get(key)
+    now[0] += 1
+    cache.put(users[2:3])
+    assert len(cache) == 4
+    assert cache.get(key) == users[0]
+    assert cache.get(f"id:{users[0]['id_str']}") is None
+
+    # expired entries are never returned
+    now[0] += 60
+    assert cache.get(f"id:{users[2]['id_str']}") is None
+
+    # and are purged by the first write of the next session
+    cache = pcache.UserCache(tmp_path / "cache.db", ttl=60, max_size=4)
+    cache.put(users[:1])
+    assert len(cache) == 2
+
+    # or on demand (e.g., periodically by the daemon)
+    now[0] += 60
+    cache.purge()
+    assert len(cache) == 0
+
+
+def test_get_user_cached(users_path):
+    user = pu.load_records(users_path)[0]
+    calls = []
+
+    def get_user(screen_name):
+        calls.append(screen_name)
+        return SimpleNamespace(_json=user, screen_name=user["screen_name"])
+
+    api = SimpleNamespace(get_user=get_user, last_response=None)
+
+    pu.get_user(user["screen_name"], api=api)
+    cached = pu.get_user(user["screen_name"].upper(), api=api)
+    assert cached._json == user
+    assert cached.screen_name == user["screen_name"]
+    assert len(calls) == 1
+
+    pu.get_user(user["screen_name"], api=api, refresh=True)
+    assert len(calls) == 2
@@ -1,4 +1,29 @@
+import json
+import os
+import subprocess
+import sys
+from contextlib import closing
+from pathlib import Path
+from types import SimpleNamespace
+
+import plumes.actions as pa
+import plumes.cli as pc
+import plumes.store as ps
+import plumes.utilities as pu
+
+# seconds `import plumes.cli` may take, since cron jobs pay it on every run
+STARTUP_BUDGET = 0.3
+
+STARTUP_SCRIPT = """
+import json, sys, time
+
+start = time.perf_counter()
 import plumes.cli as pc
+elapsed = time.perf_counter() - start
+
+pc.audit_tweets(sys.argv[1], max_likes=10)
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
 
 
 def test_check_config():
@@ -50,6 +75,15 @@ def test_audit_users(users_path):
         max_ratio=0,
     )
 
+    pc.audit_users(path=users_path, where="followers_count < 50 or tff_ratio > 2")
+
+    pc.audit_users(
+        path=users_path,
+        friends=users_path,
+        followers=users_path,
+        where="not mutual or fan",
+    )
+
     pc.audit_users(
         path=users_path,
         min_followers=float("inf"),
@@ -76,6 +110,8 @@ def test_audit_tweets(tweets_path):
         self_favorited=True,
     )
 
+    pc.audit_tweets(path=tweets_path, where="favorited and like_retweet_ratio < 1")
+
     pc.audit_tweets(
         path=tweets_path,
         min_likes=float("inf"),
@@ -90,3 +126,132 @@ def test_view_user():
 
     for u in users:
         pc.view_user(u)
+
+
+def test_index_and_view(tmp_path, users_path, tweets_path, capsys):
+    users = pu.load_records(users_path)
+    tweets = pu.load_records(tweets_path)
+    users_jsonl = tmp_path / "users.jsonl"
+    tweets_jsonl = tmp_path / "tweets.jsonl"
+    pu.dump_records(records=users, path=users_jsonl)
+    pu.dump_records(records=tweets, path=tweets_jsonl)
+
+    pc.index(path=str(users_jsonl))
+    capsys.readouterr()
+
+    pc.view_user(users[2]["screen_name"], path=str(users_jsonl))
+    assert json.loads(capsys.readouterr().out) == users[2]
+
+    pc.view_tweet(int(tweets[4]["id_str"]), path=str(tweets_jsonl))
+    assert json.loads(capsys.readouterr().out) == tweets[4]
+
+    pc.view_user("not-a-user", path=str(users_jsonl))
+    assert capsys.readouterr().out == ""
+
+    # targeted audits only read the given records
+    targets = f"{users[0]['screen_name']},{users[1]['id_str']}"
+    pc.audit_users(path=users_jsonl, targets=targets, max_followers=0)
+    pc.audit_tweets(path=tweets_jsonl, targets=(tweets[0]["id_str"],), min_likes=1)
+
+
+def test_dry_run_and_run_plan(tmp_path, monkeypatch, tweets_path, journal):
+    path = tmp_path / "plumes-plan.jsonl"
+    pc.audit_tweets(
+        path=tweets_path, max_likes=10000, prune=True, dry_run=True, plan=tmp_path
+    )
+    planned = pa.load_plan(path)["delete"]
+    assert planned and not journal.path.exists()
+
+    deleted = []
+    api = SimpleNamespace(destroy_status=lambda id: deleted.append(id))
+    monkeypatch.setattr(pu, "get_api", lambda: api)
+    monkeypatch.setattr(pu, "get_user", lambda api: SimpleNamespace(id_str="me"))
+    pc.run_plan(str(path))
+    pc.run_plan(str(path))
+    assert sorted(deleted) == sorted(planned)
+
+
+def test_sync_and_audit_store(tmp_path, users_path, tweets_path):
+    db = tmp_path / "plumes.db"
+    pc.sync(path=users_path, source="EngNadeau", kind="friends", db=db)
+    pc.sync(path=tweets_path, source="EngNadeau", kind="tweets", db=db)
+
+    with closing(ps.connect(db)) as conn:
+        users = ps.query_users(conn, kind="friends", source="EngNadeau")
+        tweets = ps.query_tweets(conn, kind="tweets", source="EngNadeau")
+    assert {u.id_str for u in users} == {
+        u["id_str"] for u in pu.load_records(users_path)
+    }
+    assert {t.id_str for t in tweets} == {
+        t["id_str"] for t in pu.load_records(tweets_path)
+    }
+
+    def audit(command, path, **kwargs):
+        plan = tmp_path / f"{command.__name__}-{path.name}-plan.jsonl"
+        command(path=path, prune=True, dry_run=True, plan=plan, **kwargs)
+        return pa.load_plan(plan)
+
+    # the store audits the same records as the files, whether its indexes
+    # pre-filter them (AND) or not (OR)
+    for bool_or in [False, True]:
+        kwargs = dict(min_followers=1000, days=30, bool_or=bool_or)
+        identified = audit(pc.audit_users, users_path, **kwargs)
+        assert identified["unfollow"]
+        assert audit(pc.audit_users, db, source="EngNadeau", **kwargs) == identified
+
+        kwargs = dict(min_likes=10, days=30, bool_or=bool_or)
+        identified = audit(pc.audit_tweets, tweets_path, **kwargs)
+        assert identified["delete"]
+        assert audit(pc.audit_tweets, db, source="EngNadeau", **kwargs) == identified
+
+
+def test_diff(tmp_path, users_path):
+    users = pu.load_records(users_path)
+
+    # e.g., two unfollowers, one new follower and one follower count change
+    old, new = users[:10], [dict(u) for u in users[2:11]]
+    new[0]["followers_count"] += 1
+    pu.dump_records(records=old, path=tmp_path / "followers-old.json")
+    pu.dump_records(records=new, path=tmp_path / "followers-new.json")
+
+    pc.diff(
+        old=tmp_path / "followers-old.json",
+        new=tmp_path / "followers-new.json",
+        output=tmp_path,
+        only="added,removed",
+    )
+
+    changes = pu.load_records(tmp_path / "followers-new-changes.jsonl")
+    assert [(c["id_str"], c["change"]) for c in changes] == [
+        (users[10]["id_str"], "added"),
+        (users[0]["id_str"], "removed"),
+        (users[1]["id_str"], "removed"),
+    ]
+    assert changes[0]["followers_count"] == users[10]["followers_count"]
+    assert "previous" not in changes[0]
+
+
+def test_startup(tweets_path):
+    env = {**os.environ, "PYTHONPATH": str(Path(pc.__file__).parents[1])}
+    runs = [
+        subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT, str(tweets_path)],
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+        )
+        for _ in range(3)
+    ]
+    results = [json.loads(r.stdout.decode().splitlines()[-1]) for r in runs]
+
+    # the record that configures logging is only logged once
+    logs = runs[0].stderr.decode().splitlines()
+    assert logs and logs.count(logs[0]) == 1
+
+    assert min(r["elapsed"] for r in results) < STARTUP_BUDGET
+
+    # offline commands never load the network stack
+    modules = results[0]["modules"]
+    assert "plumes.audit" in modules
+    assert not {"tweepy.api", "requests.adapters", "tqdm.std"} & set(modules)
@@ -0,0 +1,51 @@
+import threading
+
+import requests
+import tweepy
+
+import plumes.client as pclient
+
+
+def test_pooled_session():
+    sessions = [pclient.PooledSession(), pclient.PooledSession()]
+    adapters = [s.get_adapter("https://api.twitter.com") for s in sessions]
+    assert adapters[0] is adapters[1]
+
+    # closing a session (as tweepy does per call) keeps the pool open
+    pools = adapters[0].poolmanager.pools
+    adapters[0].poolmanager.connection_from_url("https://api.twitter.com")
+    count = len(pools)
+    sessions[0].close()
+    assert len(pools) == count > 0
+
+
+def test_thread_local_api():
+    api = pclient.ThreadLocalAPI()
+    api.last_response = "main"
+
+    responses = []
+
+    def call():
+        responses.append(api.last_response)
+        api.last_response = "worker"
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    thread.join()
+
+    assert responses == [None]
+    assert api.last_response == "main"
+
+
+def test_pooled_api():
+    api = pclient.PooledAPI()
+
+    # e.g., an API method as built for a call (`create` skips sending it)
+    assert isinstance(api.friends(create=True).session, pclient.PooledSession)
+    assert api.friends.pagination_mode == "cursor"
+    assert api.last_response is None
+
+    # other tweepy clients are left alone
+    session = tweepy.API().friends(create=True).session
+    assert not isinstance(session, pclient.PooledSession)
+    assert tweepy.binder.requests is requests
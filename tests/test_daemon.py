@@ -0,0 +1,235 @@
+import io
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import plumes.cli as cli
+import plumes.daemon as pd
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def commands(calls):
+    def greet(name="world"):
+        calls.append(name)
+        print(f"hello {name}")
+
+    def fail():
+        raise RuntimeError("boom")
+
+    return {"greet": greet, "fail": fail}
+
+
+@pytest.fixture
+def server(commands):
+    jobs = pd.load_jobs([{"command": "greet", "every": 3600}], commands)
+    runner = pd.Daemon(commands, jobs, http_commands=["greet", "fail"])
+    server = pd.DaemonServer(("127.0.0.1", 0), runner, "secret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def request(url, data=None, headers=None):
+    body = None if data is None else json.dumps(data).encode()
+    headers = {
+        "Authorization": "Bearer secret",
+        "Content-Type": "application/json",
+        **(headers or {}),
+    }
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, body, headers)) as r:
+            return r.status, json.load(r)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_load_jobs(commands):
+    jobs = pd.load_jobs(
+        [
+            {"command": "greet", "every": 60, "args": {"name": "jack"}},
+            {"name": "greet-daily", "command": "greet", "every": "86400"},
+        ],
+        commands,
+    )
+    assert [j.name for j in jobs] == ["greet", "greet-daily"]
+    assert jobs[0].args == {"name": "jack"}
+    assert jobs[1].every == 86400
+
+    with pytest.raises(ValueError):
+        pd.load_jobs([{"command": "missing", "every": 60}], commands)
+    with pytest.raises(ValueError):
+        pd.load_jobs([{"command": "greet", "every": 60}] * 2, commands)
+
+    # e.g., an incremental sync of the CLI's commands
+    jobs = pd.load_jobs([{"command": "tweets", "every": 60}], cli.get_commands())
+    assert jobs[0].command == "tweets"
+
+
+def test_run_pending(commands, calls):
+    jobs = pd.load_jobs(
+        [
+            {"command": "greet", "every": 60, "args": {"name": "jack"}},
+            {"command": "fail", "every": 60},
+        ],
+        commands,
+    )
+    runner = pd.Daemon(commands, jobs)
+
+    # every job is due on start
+    assert runner.run_pending() == ["greet", "fail"]
+    assert calls == ["jack"]
+    greet, fail = jobs
+    assert greet.runs == 1 and greet.last_error is None
+    assert fail.runs == 1 and fail.failures == 1 and fail.last_error == "boom"
+
+    # nothing is due until their interval passes
+    now = time.time()
+    assert runner.run_pending(now=now + 30) == []
+    assert runner.run_pending(now=now + 60) == ["greet", "fail"]
+    assert calls == ["jack", "jack"]
+
+    runner.trigger("fail")
+    assert runner.run_pending() == ["fail"]
+    assert fail.failures == 3
+
+
+def test_run_forever(commands, calls):
+    jobs = pd.load_jobs([{"command": "greet", "every": 3600}], commands)
+    runner = pd.Daemon(commands, jobs)
+    thread = threading.Thread(target=runner.run_forever, daemon=True)
+    thread.start()
+
+    # the first run is on start, the second is on demand
+    for expected in [1, 2]:
+        deadline = time.time() + 5
+        while len(calls) < expected and time.time() < deadline:
+            time.sleep(0.01)
+        runner.trigger("greet")
+
+    runner.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert calls[:2] == ["world", "world"]
+
+
+def test_capture_stdout(capsys):
+    started, printed = threading.Event(), threading.Event()
+
+    def job():
+        started.wait(5)
+        print("job")
+        printed.set()
+
+    # e.g., a scheduled job printing while an ad-hoc command runs
+    thread = threading.Thread(target=job)
+    thread.start()
+    with pd.capture_stdout(io.StringIO()) as output:
+        print("command")
+        started.set()
+        printed.wait(5)
+    thread.join()
+
+    assert output.getvalue() == "command\n"
+    assert capsys.readouterr().out == "job\n"
+    assert not isinstance(sys.stdout, pd.ThreadStdout)
+
+
+def test_run_forever_purges_cache(commands, user_cache, monkeypatch):
+    purges = []
+    monkeypatch.setattr(user_cache, "purge", lambda: purges.append(1))
+    runner = pd.Daemon(commands, [])
+    thread = threading.Thread(target=runner.run_forever, daemon=True)
+    thread.start()
+
+    deadline = time.time() + 5
+    while not purges and time.time() < deadline:
+        time.sleep(0.01)
+    runner.stop()
+    thread.join(timeout=5)
+    assert purges
+
+
+def test_daemon_server(server, calls):
+    status, payload = request(f"{server.url}/commands/greet", {"name": "jack"})
+    assert status == 200
+    assert payload == {"output": "hello jack\n"}
+
+    status, payload = request(f"{server.url}/commands/greet", {"typo": "jack"})
+    assert status == 400
+
+    status, payload = request(f"{server.url}/commands/fail", {})
+    assert status == 500
+    assert payload["error"] == "boom"
+
+    status, payload = request(f"{server.url}/commands/missing", {})
+    assert status == 404
+
+    status, payload = request(f"{server.url}/jobs/greet", {})
+    assert status == 202
+    assert server.daemon.jobs["greet"].next_run == 0
+
+    status, payload = request(f"{server.url}/status")
+    assert status == 200
+    assert payload["commands"] == ["fail", "greet"]
+    assert payload["jobs"]["greet"]["runs"] == 0
+    assert "endpoints" in payload["metrics"]
+    assert calls == ["jack"]
+
+
+def test_daemon_server_security(server, calls):
+    url = f"{server.url}/commands/greet"
+
+    status, _ = request(url, {}, headers={"Authorization": "Bearer wrong"})
+    assert status == 401
+    status, _ = request(url, {}, headers={"Authorization": ""})
+    assert status == 401
+
+    # e.g., a cross-site form post
+    status, _ = request(url, {}, headers={"Content-Type": "text/plain"})
+    assert status == 415
+
+    # e.g., DNS rebinding of another domain to 127.0.0.1
+    status, _ = request(url, {}, headers={"Host": "evil.example:8787"})
+    assert status == 403
+    assert pd.is_local_host("localhost:8787")
+    assert pd.is_local_host("[::1]:8787")
+    assert not pd.is_local_host("127.0.0.1.evil.example")
+
+    status, _ = request(url, [])
+    assert status == 400
+    assert calls == []
+
+
+def test_http_commands(commands):
+    runner = pd.Daemon({**commands, "view_config": print}, [])
+    assert runner.run_command("view_config", {})[0] == 404
+    assert "view_config" not in runner.status()["commands"]
+
+    # only exports and lookups are exposed
+    for name in ["init", "view_config", "audit_users", "audit_tweets", "run_plan"]:
+        assert name in cli.get_commands()
+        assert name not in pd.HTTP_COMMANDS
+    assert set(pd.HTTP_COMMANDS) <= set(cli.get_commands())
+
+
+def test_write_token(tmp_path):
+    path = tmp_path / "token"
+    path.write_text("old")
+    path.chmod(0o644)
+
+    token = pd.write_token(path)
+    assert path.read_text() == token != "old"
+    assert path.stat().st_mode & 0o777 == 0o600
@@ -0,0 +1,34 @@
+import plumes.audit as pau
+import plumes.diff as pdiff
+import plumes.utilities as pu
+
+
+def test_diff_exports(tmp_path, users_path):
+    users = pu.load_records(users_path)
+
+    # today: two unfollowers, one new follower and one follower count change
+    old = users[:60]
+    new = [dict(u) for u in users[2:61]]
+    new[0]["followers_count"] += 1
+
+    old_path = tmp_path / "old.json"
+    new_path = tmp_path / "new.jsonl"
+    pu.dump_records(records=old, path=old_path)
+    pu.dump_records(records=new, path=new_path)
+
+    output = tmp_path / "changes.jsonl"
+    counts = pdiff.diff_exports(old=old_path, new=new_path, output=output)
+    assert counts == {"added": 1, "removed": 2, "changed": 1}
+
+    changes = {c["id_str"]: c for c in pu.load_records(output)}
+    assert changes[users[60]["id_str"]]["change"] == "added"
+    assert changes[users[0]["id_str"]]["change"] == "removed"
+    assert changes[users[2]["id_str"]]["previous"] == {
+        "followers_count": users[2]["followers_count"]
+    }
+
+    # the change log can be audited like any export
+    assert len(pau.load_users(output)) == 4
+
+    pdiff.diff_exports(old=old_path, new=new_path, output=output, only=["removed"])
+    assert {c["change"] for c in pu.load_records(output)} == {"removed"}
@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+import plumes.actions as pa
+import plumes.fakeapi as pfake
+import plumes.utilities as pu
+
+
+@pytest.fixture
+def fake_twitter(monkeypatch, users_path, tweets_path):
+    twitter = pfake.FakeTwitter(
+        users=pu.load_records(users_path),
+        tweets=pu.load_records(tweets_path),
+        fail_every=4,
+    )
+    server = pfake.FakeTwitterServer(("127.0.0.1", 0), twitter)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(pu.settings, "api_url", server.url)
+    yield twitter
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_fake_api_exports(tmp_path, monkeypatch, fake_twitter):
+    sleeps = []
+    monkeypatch.setattr(pu.time, "sleep", sleeps.append)
+    api = pu.get_api()
+
+    user = pu.get_user("alyankovic", api=api)
+    assert user.screen_name == "alyankovic"
+    assert user.followers_count == len(fake_twitter.users)
+
+    path = tmp_path / "followers.jsonl"
+    pu.get_tweepy_objects(
+        func=api.followers,
+        screen_name="alyankovic",
+        output=path,
+        total=user.followers_count,
+        jsonl=True,
+        api=api,
+        endpoint="/followers/list",
+    )
+    assert pu.load_records(path) == fake_twitter.users
+
+    # timelines are paged by ID, whose 429s tweepy doesn't raise as RateLimitError
+    path = tmp_path / "tweets.jsonl"
+    pu.get_tweepy_objects(
+        func=api.user_timeline,
+        screen_name="alyankovic",
+        output=path,
+        total=user.statuses_count,
+        count=30,
+        jsonl=True,
+        api=api,
+        endpoint="/statuses/user_timeline",
+    )
+    assert pu.load_records(path) == fake_twitter.tweets
+
+    tweet = fake_twitter.tweets[5]
+    assert pu.get_tweet(tweet["id_str"], api=api)._json == tweet
+
+    # injected 429s were waited out (tweepy itself sleeps 0s between tries)
+    assert len([s for s in sleeps if s > 0]) == len(fake_twitter.requests) // 4
+
+
+def test_fake_api_rate_limits(fake_twitter):
+    fake_twitter.limits["/friends/list"] = 2
+    fake_twitter.fail_every = 0
+
+    statuses = [
+        fake_twitter.handle("GET", "/1.1/friends/list.json", {}) for _ in range(3)
+    ]
+    assert [s[0] for s in statuses] == [200, 200, 429]
+    assert [s[1]["x-rate-limit-remaining"] for s in statuses] == ["1", "0", "0"]
+
+    status, _, _ = fake_twitter.handle("POST", "/1.1/statuses/update.json", {})
+    assert status == 404
+
+
+def test_fake_api_actions(monkeypatch, fake_twitter):
+    monkeypatch.setattr(pa.time, "sleep", lambda s: None)
+    api = pu.get_api()
+    tweet_ids = [t["id_str"] for t in fake_twitter.tweets[:10]]
+
+    summary = pa.run_actions(
+        func=api.destroy_status,
+        targets=tweet_ids,
+        api=api,
+        endpoint="/statuses/destroy/:id",
+        description="Deleting",
+        retries=3,
+    )
+    assert sorted(summary["succeeded"]) == sorted(tweet_ids)
+    assert fake_twitter.requests.count("/statuses/destroy/:id") > len(tweet_ids)
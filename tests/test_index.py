@@ -0,0 +1,52 @@
+import pytest
+
+import plumes.index as pi
+import plumes.utilities as pu
+
+
+@pytest.fixture
+def users_jsonl(tmp_path, users_path):
+    path = tmp_path / "users.jsonl"
+    pu.dump_records(records=pu.load_records(users_path), path=path)
+    return path
+
+
+def test_build_index(users_jsonl):
+    users = pu.load_records(users_jsonl)
+    index_path = pi.build_index(users_jsonl)
+    assert index_path == pi.get_index_path(users_jsonl)
+    assert pi.is_fresh(users_jsonl)
+
+    with pi.IndexedExport(users_jsonl) as export:
+        for u in users:
+            assert export.find(u["id_str"]) == u
+            assert export.find(f"@{u['screen_name'].upper()}") == u
+        assert export.find("not-a-user") is None
+
+        # duplicates and missing targets are skipped
+        targets = [users[3]["screen_name"], users[3]["id_str"], "missing", 0]
+        assert export.find_many(targets) == [users[3]]
+
+    for path in [
+        users_jsonl.with_suffix(".json"),
+        users_jsonl.with_name("users.jsonl.gz"),
+    ]:
+        with pytest.raises(ValueError):
+            pi.build_index(path)
+
+
+def test_stale_index(users_jsonl):
+    users = pu.load_records(users_jsonl)
+    pi.build_index(users_jsonl)
+
+    # rewriting the export invalidates its index
+    pu.dump_records(records=users[:2], path=users_jsonl)
+    assert not pi.is_fresh(users_jsonl)
+    with pi.IndexedExport(users_jsonl) as export:
+        assert export.find(users[1]["id_str"]) == users[1]
+        assert export.find(users[2]["id_str"]) is None
+    assert pi.is_fresh(users_jsonl)
+
+    users_jsonl.write_text("")
+    with pi.IndexedExport(users_jsonl) as export:
+        assert export.find(users[1]["id_str"]) is None
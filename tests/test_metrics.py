@@ -0,0 +1,59 @@
+import json
+
+import plumes.cli as pc
+import plumes.metrics as pm
+
+
+def test_get_endpoint():
+    url = "https://api.twitter.com/1.1/statuses/destroy/123.json?trim_user=1"
+    assert pm.get_endpoint(url) == "/statuses/destroy/:id"
+    assert pm.get_endpoint("http://127.0.0.1:8080/1.1/friends/list.json") == (
+        "/friends/list"
+    )
+
+
+def test_metrics(tmp_path):
+    metrics = pm.Metrics()
+    metrics.record_call("/friends/list", seconds=0.2, size=1000, status="200")
+    metrics.record_call("/friends/list", seconds=3, size=100, status="429")
+    metrics.record_sleep("rate_limited", 900)
+    with metrics.stage("load"):
+        pass
+
+    summary = metrics.summary()
+    stats = summary["endpoints"]["/friends/list"]
+    assert stats["calls"] == 2
+    assert stats["statuses"] == {"200": 1, "429": 1}
+    assert stats["rate_limited"] == 1
+    assert stats["bytes"] == 1100
+    assert sum(stats["buckets"]) == 2
+    assert summary["sleeps"] == {"rate_limited": 900}
+    assert summary["stages"]["load"]["runs"] == 1
+
+    path = tmp_path / "metrics.json"
+    textfile = tmp_path / "plumes.prom"
+    metrics.emit(path=str(path), textfile=str(textfile))
+
+    with open(path) as f:
+        assert json.load(f)["endpoints"] == summary["endpoints"]
+
+    text = textfile.read_text()
+    assert (
+        'plumes_api_request_duration_seconds_bucket{endpoint="/friends/list",le="0.25"} 1'
+        in text
+    )
+    assert (
+        'plumes_api_request_duration_seconds_bucket{endpoint="/friends/list",le="+Inf"} 2'
+        in text
+    )
+    assert 'plumes_sleep_seconds_total{reason="rate_limited"} 900' in text
+
+
+def test_audit_stages(users_path):
+    stages = pm.get_metrics().stages
+    runs = {k: stages.get(k, {}).get("runs", 0) for k in ["load", "audit"]}
+
+    pc.audit_users(str(users_path), max_followers=100)
+
+    assert stages["load"]["runs"] == runs["load"] + 1
+    assert stages["audit"]["runs"] == runs["audit"] + 1
@@ -0,0 +1,95 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import plumes.ratelimit as pr
+
+
+def make_api(remaining, reset):
+    headers = {"x-rate-limit-remaining": str(remaining), "x-rate-limit-reset": reset}
+    status = {
+        "resources": {
+            "followers": {
+                "/followers/list": {"limit": 15, "remaining": remaining, "reset": reset}
+            }
+        }
+    }
+    return SimpleNamespace(
+        last_response=SimpleNamespace(headers=headers),
+        rate_limit_status=lambda: status,
+    )
+
+
+def test_rate_limiter_prime():
+    limiter = pr.RateLimiter(buffer=0)
+    reset = int(time.time()) + 60
+    limiter.prime(make_api(remaining=3, reset=reset))
+
+    assert limiter.budgets["/followers/list"] == {"remaining": 3, "reset": reset}
+    assert limiter.get_delay("/followers/list") == 0
+
+
+def test_rate_limiter_sleeps_until_reset(monkeypatch):
+    now = 1000
+    sleeps = []
+    monkeypatch.setattr(pr.time, "time", lambda: now + sum(sleeps))
+    monkeypatch.setattr(pr.time, "sleep", sleeps.append)
+
+    limiter = pr.RateLimiter(buffer=0)
+    api = make_api(remaining=0, reset=now + 30)
+    headers = api.last_response.headers
+
+    def followers(**kwargs):
+        api.last_response = SimpleNamespace(headers=headers)
+        return []
+
+    followers.pagination_mode = "cursor"
+    func = limiter.wrap(followers, api=api, endpoint="/followers/list")
+    assert func.pagination_mode == "cursor"
+
+    # first call learns the budget from the response headers
+    func()
+    assert sleeps == []
+    assert limiter.budgets["/followers/list"]["remaining"] == 0
+
+    # next call waits exactly until the window resets
+    func()
+    assert sleeps == [30]
+
+
+def test_rate_limiter_ignores_stale_responses():
+    limiter = pr.RateLimiter(buffer=0)
+    reset = int(time.time()) + 60
+
+    # the last response is an earlier call's, to another endpoint
+    api = make_api(remaining=10, reset=reset)
+    limiter.budgets["/friends/list"] = {"remaining": 1, "reset": reset}
+
+    def timeout(**kwargs):
+        raise pr.tweepy.error.TweepError("Failed to send request")
+
+    with pytest.raises(pr.tweepy.error.TweepError):
+        limiter.wrap(timeout, api=api, endpoint="/friends/list")()
+    assert limiter.budgets["/friends/list"] == {"remaining": 0, "reset": reset}
+
+    # errors with a response (e.g., 429s) still update the budget
+    def rate_limited(**kwargs):
+        response = SimpleNamespace(
+            status_code=429,
+            headers={"x-rate-limit-remaining": "0", "x-rate-limit-reset": reset + 1},
+        )
+        raise pr.tweepy.error.TweepError("Rate limit exceeded", response)
+
+    limiter.budgets["/friends/list"]["remaining"] = 1
+    with pytest.raises(pr.tweepy.error.TweepError):
+        limiter.wrap(rate_limited, api=api, endpoint="/friends/list")()
+    assert limiter.budgets["/friends/list"] == {"remaining": 0, "reset": reset + 1}
+
+
+def test_get_reset_delay(monkeypatch):
+    monkeypatch.setattr(pr.time, "time", lambda: 1000)
+    response = SimpleNamespace(headers={"x-rate-limit-reset": "1030"})
+
+    assert pr.get_reset_delay(response) == 30 + pr.settings.rate_limit_buffer
+    assert pr.get_reset_delay(None) == pr.settings.sleep_time
@@ -0,0 +1,44 @@
+from contextlib import closing
+
+import plumes.store as ps
+import plumes.utilities as pu
+
+
+def test_sync_and_query(tmp_path, users_path, tweets_path):
+    users = pu.load_records(users_path)
+    tweets = pu.load_records(tweets_path)
+
+    with closing(ps.connect(tmp_path / "plumes.db")) as conn:
+        assert ps.sync_records(conn, users, source="EngNadeau", kind="friends") == 100
+
+        # re-syncing upserts rather than duplicating
+        ps.sync_records(conn, users, source="EngNadeau", kind="friends")
+        assert len(ps.query_users(conn, kind="friends", source="engnadeau")) == 100
+        assert ps.query_users(conn, kind="followers") == []
+
+        # users missing from a later snapshot left the collection
+        ps.sync_records(conn, users[:10], source="EngNadeau", kind="followers")
+        ps.sync_records(conn, users[5:15], source="engnadeau", kind="followers")
+        queried = ps.query_users(conn, kind="followers", source="EngNadeau")
+        assert {u.id_str for u in queried} == {u["id_str"] for u in users[5:15]}
+        assert len(ps.query_users(conn, kind="friends")) == 100
+
+        # tweet exports may be incremental, so earlier tweets are kept
+        ps.sync_records(conn, tweets[:10], source="EngNadeau", kind="favorites")
+        ps.sync_records(conn, tweets[10:20], source="EngNadeau", kind="favorites")
+        assert len(ps.query_tweets(conn, kind="favorites")) == 20
+
+        # criteria are pushed down to the indexed columns
+        queried = ps.query_users(
+            conn,
+            kind="friends",
+            criteria=[("followers_count", "<", 1000), ("tff_ratio", ">", 1)],
+        )
+        expected = {u["id_str"] for u in users if u["followers_count"] < 1000}
+        assert {u.id_str for u in queried} == expected
+
+        ps.sync_records(conn, tweets, source="EngNadeau", kind="tweets")
+        queried = ps.query_tweets(conn, criteria=[("favorited", "==", True)])
+        assert [t.id_str for t in queried] == [
+            t["id_str"] for t in tweets if t["favorited"]
+        ]
@@ -1,8 +1,29 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+import tweepy
+
 import plumes.utilities as pu
 
 
 def test_set_output(tmp_path):
-    pu.set_output(fname="foo", path=tmp_path)
+    assert pu.set_output(fname="foo", path=tmp_path) == tmp_path / "foo"
+
+    # new folders are created, but paths with an export suffix are files
+    path = pu.set_output(fname="foo", path=tmp_path / "exports")
+    assert path == tmp_path / "exports" / "foo"
+    assert path.parent.is_dir()
+    path = pu.set_output(fname="foo", path=tmp_path / "daily" / "friends.json")
+    assert path == tmp_path / "daily" / "friends.json"
+    assert path.parent.is_dir() and not path.exists()
+
+    # only export suffixes name a file, so folders can have dots
+    path = pu.set_output(fname="foo", path=tmp_path / "exports.v2")
+    assert path == tmp_path / "exports.v2" / "foo"
+    path = pu.set_output(fname="foo", path=tmp_path / "tweets.jsonl.gz")
+    assert path == tmp_path / "tweets.jsonl.gz"
 
 
 def test_get_user():
@@ -11,3 +32,274 @@ def test_get_user():
     pu.get_user("SteveMartinToGo")
     pu.get_user("alyankovic")
     pu.get_user("ConanOBrien")
+
+
+def test_get_tweepy_objects_jsonl(tmp_path, paged_users):
+    path = tmp_path / "users.jsonl"
+    pu.get_tweepy_objects(
+        func=paged_users, screen_name=None, output=path, total=50, count=20, jsonl=True
+    )
+
+    with open(path) as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 50
+    assert lines[0]["id_str"] == paged_users()[0][0]._json["id_str"]
+
+
+def test_prefetch():
+    produced = []
+
+    def numbers():
+        for i in range(100):
+            produced.append(i)
+            yield i
+        raise RuntimeError("connection lost")
+
+    fetched = pu.prefetch(numbers(), depth=2)
+    items = iter(fetched)
+    assert next(items) == 0
+    time.sleep(0.2)
+
+    # the bounded queue holds two items; one more waits to be put
+    assert len(produced) <= 4
+    fetched.close()
+    time.sleep(0.2)
+    assert len(produced) <= 4
+
+    with pytest.raises(RuntimeError):
+        list(pu.prefetch(numbers(), depth=2))
+
+
+def test_get_tweepy_objects_prefetch(tmp_path, monkeypatch, paged_users):
+    calls = []
+    ahead = []
+
+    def friends(**kwargs):
+        calls.append(kwargs)
+        return paged_users(**kwargs)
+
+    friends.pagination_mode = paged_users.pagination_mode
+    serialize = pu.tweepy_to_jsonl
+
+    def tweepy_to_jsonl(models, f):
+        # the next page is requested while this one is still being written
+        page = len(ahead) + 1
+        deadline = time.time() + 0.5
+        while len(calls) <= page and time.time() < deadline:
+            time.sleep(0.01)
+        ahead.append(len(calls) > page)
+        serialize(models=models, f=f)
+
+    monkeypatch.setattr(pu, "tweepy_to_jsonl", tweepy_to_jsonl)
+    path = tmp_path / "users.jsonl"
+    pu.get_tweepy_objects(
+        func=friends, screen_name=None, output=path, total=100, count=20, jsonl=True
+    )
+
+    assert len(pu.load_records(path)) == 100
+    # nothing is fetched past the last page
+    assert ahead == [True, True, True, True, False]
+    assert len(calls) == 5
+
+
+def test_get_tweepy_objects_compressed(tmp_path, paged_users):
+    path = tmp_path / "users.jsonl.gz"
+    pu.get_tweepy_objects(
+        func=paged_users, screen_name=None, output=path, total=50, count=20, jsonl=True
+    )
+
+    users, _ = paged_users(count=50)
+    assert pu.load_records(path) == [u._json for u in users]
+    assert list(tmp_path.iterdir()) == [path]
+
+    with pytest.raises(ValueError):
+        pu.get_tweepy_objects(
+            func=paged_users,
+            screen_name=None,
+            output=path,
+            total=50,
+            jsonl=True,
+            resume=True,
+        )
+
+
+def test_get_tweepy_objects_resume(tmp_path, paged_users):
+    path = tmp_path / "users.jsonl"
+    state_path = pu.get_checkpoint_path(path)
+
+    # interrupt the export after two pages, leaving a checkpoint behind
+    calls = []
+    crash = [True]
+
+    def interrupted(**kwargs):
+        if crash[0] and len(calls) == 2:
+            raise RuntimeError("connection lost")
+        calls.append(kwargs)
+        return paged_users(**kwargs)
+
+    interrupted.pagination_mode = paged_users.pagination_mode
+    with pytest.raises(RuntimeError):
+        pu.get_tweepy_objects(
+            func=interrupted,
+            screen_name=None,
+            output=path,
+            total=100,
+            count=20,
+            jsonl=True,
+        )
+    assert pu.load_checkpoint(state_path)["written"] == 40
+
+    # continue from the checkpoint without refetching the first pages
+    calls.clear()
+    crash[0] = False
+    pu.get_tweepy_objects(
+        func=interrupted,
+        screen_name=None,
+        output=path,
+        total=100,
+        count=20,
+        jsonl=True,
+        resume=True,
+    )
+    assert calls[0]["cursor"] == 40
+
+    with open(path) as f:
+        ids = [json.loads(line)["id_str"] for line in f]
+    assert len(ids) == len(set(ids)) == 100
+    assert not state_path.exists()
+
+
+@pytest.mark.parametrize("fname", ["tweets.jsonl", "tweets.jsonl.gz", "tweets.csv"])
+def test_get_tweepy_objects_incremental(tmp_path, tweets_path, fname):
+    tweets = pu.load_records(tweets_path)
+    since_ids = []
+
+    def timeline(cursor=-1, count=20, since_id=None, **kwargs):
+        since_ids.append(since_id)
+        page = [SimpleNamespace(_json=t) for t in tweets if t["id"] > (since_id or 0)]
+        return page, (0, 0)
+
+    timeline.pagination_mode = "cursor"
+
+    # yesterday's export is missing the newest ten tweets
+    path = tmp_path / fname
+    pu.dump_records(records=tweets[10:], path=path)
+
+    pu.get_tweepy_objects(
+        func=timeline,
+        screen_name=None,
+        output=path,
+        total=100,
+        jsonl=".jsonl" in path.suffixes,
+        incremental=True,
+    )
+
+    assert since_ids == [tweets[10]["id"]]
+    assert [r["id_str"] for r in pu.load_records(path)] == [t["id_str"] for t in tweets]
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_hydrate_users_by_ids(tmp_path, users_path, capsys):
+    users = pu.load_records(users_path)
+    lookups = []
+
+    def friends_ids(cursor=-1, **kwargs):
+        return [u["id"] for u in users], (0, 0)
+
+    def lookup_users(user_ids):
+        lookups.append(user_ids)
+        # suspended accounts are silently dropped by the API
+        return [
+            SimpleNamespace(id=u["id"], _json=u) for u in users if u["id"] in user_ids
+        ][1:]
+
+    friends_ids.pagination_mode = "cursor"
+    api = SimpleNamespace(
+        friends_ids=friends_ids,
+        lookup_users=lookup_users,
+        rate_limit_status=lambda: {"resources": {}},
+        last_response=None,
+    )
+
+    # half of the users are still fresh in yesterday's export
+    previous = tmp_path / "previous.json"
+    pu.dump_records(records=users[:50], path=previous)
+
+    path = tmp_path / "friends.jsonl"
+    pu.get_users_by_ids(
+        api=api,
+        ids_func=api.friends_ids,
+        screen_name=None,
+        output=path,
+        total=100,
+        jsonl=True,
+        previous=previous,
+    )
+
+    assert [len(ids) for ids in lookups] == [50]
+    assert pu.load_records(path) == users[:50] + users[51:]
+    assert "100/100" in capsys.readouterr().err
+
+    # without the previous export, only users missing from the cache are looked up
+    pu.get_users_by_ids(
+        api=api,
+        ids_func=api.friends_ids,
+        screen_name=None,
+        output=path,
+        total=100,
+        jsonl=True,
+        progress=False,
+    )
+    assert lookups[1] == [u["id"] for u in users[:51]]
+    assert "100/100" not in capsys.readouterr().err
+
+
+def test_hydrate_users_by_ids_edge_cases(tmp_path, users_path, monkeypatch):
+    users = pu.load_records(users_path)[:30]
+    monkeypatch.setattr(pu.settings, "lookup_batch_size", 10)
+
+    def friends_ids(cursor=-1, **kwargs):
+        return [u["id"] for u in users], (0, 0)
+
+    def lookup_users(user_ids):
+        # users/lookup 404s when none of the batch resolves (e.g., all suspended)
+        if user_ids[0] == users[20]["id"]:
+            raise tweepy.TweepError(
+                [{"code": 17, "message": "No user matches for specified terms."}],
+                SimpleNamespace(status_code=404),
+            )
+        return [
+            SimpleNamespace(id=u["id"], _json=u) for u in users if u["id"] in user_ids
+        ]
+
+    friends_ids.pagination_mode = "cursor"
+    api = SimpleNamespace(
+        friends_ids=friends_ids,
+        lookup_users=lookup_users,
+        rate_limit_status=lambda: {"resources": {}},
+        last_response=None,
+    )
+
+    # a CSV export's partial users are looked up again rather than reused
+    previous = tmp_path / "previous.csv"
+    pu.dump_records(records=users[:10], path=previous)
+
+    path = tmp_path / "friends.jsonl"
+    kwargs = dict(api=api, ids_func=api.friends_ids, screen_name=None, total=30)
+    pu.get_users_by_ids(output=path, jsonl=True, previous=previous, **kwargs)
+    assert pu.load_records(path) == users[:20]
+
+    with pytest.raises(ValueError):
+        pu.get_users_by_ids(output=path, jsonl=True, resume=True, **kwargs)
+
+
+def test_iter_records(tmp_path, tweets_path):
+    tweets = pu.load_records(tweets_path)
+
+    # records larger than a chunk are still read whole
+    assert list(pu.iter_records(tweets_path, chunk_size=64)) == tweets
+
+    path = tmp_path / "truncated.json"
+    path.write_text(tweets_path.read_text()[:-100])
+    with pytest.raises(json.JSONDecodeError):
+        list(pu.iter_records(path))